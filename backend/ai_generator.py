@@ -1,6 +1,35 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import re
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import anthropic
+import httpx
+from cache import SemanticResponseCache, TTLCache
+
+# Event loop behind the synchronous wrappers. It lives as long as the process
+# so connections pooled by a shared async client stay bound to a running loop.
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+
+def _run_sync(coro):
+    """Run a coroutine on the shared background loop and wait for its result"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_sync_loop.run_forever, name="ai-generator-sync", daemon=True
+            ).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+# Yielded by stream_response when text already streamed was only a lead-in to
+# tool calls (e.g. "Let me search...") and should be discarded by the consumer
+STREAM_RESET = object()
 
 
 class AIGenerator:
@@ -63,20 +92,112 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    # Marks a prompt-caching breakpoint; everything up to it is cached server-side
+    CACHE_CONTROL = {"type": "ephemeral"}
+
+    # Seconds without any stream event before a streamed call is abandoned
+    STREAM_STALL_TIMEOUT = 30.0
+
+    # Approximate token budget for conversation history (~4 characters/token)
+    MAX_HISTORY_TOKENS = 1200
+
+    # Built once: the cached system block and the header for history blocks
+    _SYSTEM_BLOCK = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": CACHE_CONTROL,
+    }
+    _HISTORY_PREFIX = "Previous conversation:\n"
+    _HISTORY_OMITTED = "[Earlier conversation omitted]\n"
+    _TURN_BOUNDARY = re.compile(r"\n(?=(?:User|Assistant): )")
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        cache_size: int = 2048,
+        cache_ttl: float = 3600.0,
+        semantic_cache: Optional[SemanticResponseCache] = None,
+    ):
+        self.api_key = api_key
+        # One async client shared by all async requests. The sync wrappers run
+        # on their own loop and get their own client, since pooled connections
+        # can only be reused on the loop that opened them.
+        self._async_client = self._create_client()
+        self._sync_client: Optional[anthropic.AsyncAnthropic] = None
         self.model = model
 
+        # Answers that needed no tools, keyed by prompt/history/tools digest
+        self._response_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Optional fallback that also matches reworded versions of a question
+        self._semantic_cache = semantic_cache
+
+        # Last tools list seen, with its breakpoint copy and canonical JSON; the
+        # tool manager hands out the same list every time, so this is built once
+        self._prepared_tools: Optional[Tuple[List, List, str]] = None
+
         # Pre-build base API parameters
         self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
 
-    def generate_response(
+        # Running token counts, including prompt-cache reads and writes
+        self.token_usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        """The client whose connection pool belongs to the running event loop"""
+        try:
+            on_sync_loop = asyncio.get_running_loop() is _sync_loop
+        except RuntimeError:
+            on_sync_loop = False
+        if not on_sync_loop:
+            return self._async_client
+
+        # Only the sync loop's thread gets here, so creation cannot race
+        if self._sync_client is None:
+            self._sync_client = self._create_client()
+        return self._sync_client
+
+    def _create_client(self) -> anthropic.AsyncAnthropic:
+        """Build an Anthropic client for one event loop"""
+        # The tuned pool keeps warm HTTP/2 connections around so follow-up
+        # rounds skip the TLS handshake
+        return anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=50,
+                    keepalive_expiry=300.0,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+
+    def generate_response(self, *args, **kwargs) -> str:
+        """
+        Synchronous wrapper around agenerate_response for legacy call sites.
+
+        Every call runs on the same background event loop, using a client of
+        its own: reusing the async client's pooled connections from another
+        loop fails, and a fresh loop per call (asyncio.run) would break every
+        call after the first.
+        """
+        return _run_sync(self.agenerate_response(*args, **kwargs))
+
+    async def agenerate_response(
         self,
         query: str,
         conversation_history: Optional[str] = None,
         tools: Optional[List] = None,
         tool_manager=None,
         max_tool_rounds: int = 2,
+        question: Optional[str] = None,
     ) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
@@ -87,43 +208,147 @@ Provide only the direct answer to what was asked.
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
             max_tool_rounds: Maximum sequential tool calling rounds (default: 2)
+            question: The user's own wording of the query, which lets a
+                reworded repeat be served from the semantic cache
 
         Returns:
             Generated response as string
         """
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
+        # The semantic cache embeds the user's own words; follow-ups such as
+        # "tell me more" mean different things in different conversations
+        if conversation_history:
+            question = None
 
-        # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content,
-        }
+        # Serve repeated questions without a round trip to Claude
+        context_key = self._context_key(conversation_history, tools)
+        cached = await self._get_cached(query, context_key, question)
+        if cached is not None:
+            return cached
 
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+        api_params = self._build_api_params(query, conversation_history, tools)
 
         # Get response from Claude
-        response = self.client.messages.create(**api_params)
+        response = await self.client.messages.create(**api_params)
+        self._extract_tokens(response)
 
-        # Handle tool execution if needed
+        # Handle tool execution if needed (not cached - tool results may change)
         if response.stop_reason == "tool_use" and tool_manager:
-            return self._handle_sequential_tool_execution(
+            if max_tool_rounds == 1:
+                return await self._handle_single_tool_round(
+                    response, api_params, tool_manager
+                )
+            return await self._handle_sequential_tool_execution(
                 response, api_params, tool_manager, max_tool_rounds
             )
 
         # Return direct response
+        text = self._extract_text_from_response(response)
+        if response.stop_reason != "tool_use":
+            await self._set_cached(query, context_key, text, question)
+        return text
+
+    async def stream_response(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+        max_tool_rounds: int = 2,
+        question: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream response text as it is generated, running tools between rounds.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            max_tool_rounds: Maximum sequential tool calling rounds (default: 2)
+            question: The user's own wording of the query, which lets a
+                reworded repeat be served from the semantic cache
+
+        Yields:
+            Text chunks in the order Claude produces them, and STREAM_RESET
+            after a round whose text turned out to precede tool calls
+
+        Raises:
+            TimeoutError: If the stream stalls for STREAM_STALL_TIMEOUT seconds
+        """
+        # The semantic cache embeds the user's own words; follow-ups such as
+        # "tell me more" mean different things in different conversations
+        if conversation_history:
+            question = None
+        context_key = self._context_key(conversation_history, tools)
+        cached = await self._get_cached(query, context_key, question)
+        if cached is not None:
+            yield cached
+            return
+
+        base_params = self._build_api_params(query, conversation_history, tools)
+        messages = list(base_params["messages"])
+        api_params = base_params
+        current_round = 0
+
+        while True:
+            chunks = []
+            async with self.client.messages.stream(**api_params) as stream:
+                async for text in self._iter_stream_text(stream):
+                    chunks.append(text)
+                    yield text
+                response = await stream.get_final_message()
+            self._extract_tokens(response)
+
+            # Done unless Claude asked for tools and we can still run them
+            if (
+                response.stop_reason != "tool_use"
+                or not tool_manager
+                or current_round >= max_tool_rounds
+            ):
+                if current_round == 0 and response.stop_reason != "tool_use":
+                    await self._set_cached(
+                        query, context_key, "".join(chunks), question
+                    )
+                return
+
+            # The round's text was a lead-in to the tool calls, not the answer
+            if chunks:
+                yield STREAM_RESET
+
+            tool_results = await self._execute_tools(response, tool_manager)
+            self._append_tool_round(messages, response, tool_results)
+            current_round += 1
+
+            api_params = self._next_round_params(
+                base_params, messages, keep_tools=current_round < max_tool_rounds
+            )
+
+    async def _handle_single_tool_round(
+        self, initial_response, base_params: Dict[str, Any], tool_manager
+    ) -> str:
+        """
+        Fast path for a single tool round: run the requested tools once and
+        ask for the final answer without tools, skipping the round loop.
+        """
+        tool_results = await self._execute_tools(initial_response, tool_manager)
+        # No later round reads the cache, so the tool results get no breakpoint
+        messages = [
+            *base_params["messages"],
+            {"role": "assistant", "content": initial_response.content},
+            {"role": "user", "content": tool_results},
+        ]
+        final_params = self._next_round_params(base_params, messages, keep_tools=False)
+
+        try:
+            response = await self.client.messages.create(**final_params)
+            self._extract_tokens(response)
+        except Exception as e:
+            return f"Error during tool execution: {str(e)}"
+
         return self._extract_text_from_response(response)
 
-    def _handle_sequential_tool_execution(
+    async def _handle_sequential_tool_execution(
         self,
         initial_response,
         base_params: Dict[str, Any],
@@ -143,7 +368,7 @@ Provide only the direct answer to what was asked.
             Final response text after all rounds
         """
         # Initialize message history and round counter
-        messages = base_params["messages"].copy()
+        messages = list(base_params["messages"])
         current_round = 0
         current_response = initial_response
 
@@ -154,54 +379,23 @@ Provide only the direct answer to what was asked.
                 # Claude is done - has final answer without needing more tools
                 return self._extract_text_from_response(current_response)
 
-            # Execute all requested tools
-            tool_results = []
-            for content_block in current_response.content:
-                if content_block.type == "tool_use":
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, **content_block.input
-                    )
-
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
-
-            # Add assistant's response (contains tool_use blocks)
-            messages.append({"role": "assistant", "content": current_response.content})
-
-            # Add tool results as user message
-            if tool_results:
-                messages.append({"role": "user", "content": tool_results})
+            # Execute all requested tools and record the round
+            tool_results = await self._execute_tools(current_response, tool_manager)
+            self._append_tool_round(messages, current_response, tool_results)
 
             # Increment round counter
             current_round += 1
 
-            # Prepare next API call
-            if current_round < max_rounds:
-                # Still within limit - keep tools available for potential next round
-                next_params = {
-                    **self.base_params,
-                    "messages": messages,
-                    "system": base_params["system"],
-                    "tools": base_params.get("tools", []),  # KEEP TOOLS AVAILABLE
-                    "tool_choice": {"type": "auto"},
-                }
-            else:
-                # Max rounds reached - force final answer without tools
-                next_params = {
-                    **self.base_params,
-                    "messages": messages,
-                    "system": base_params["system"],
-                    # NO tools - force Claude to synthesize final answer
-                }
+            # Keep tools available while within limit; once max rounds is
+            # reached, drop them to force Claude to synthesize a final answer
+            next_params = self._next_round_params(
+                base_params, messages, keep_tools=current_round < max_rounds
+            )
 
             # Make next API call
             try:
-                current_response = self.client.messages.create(**next_params)
+                current_response = await self.client.messages.create(**next_params)
+                self._extract_tokens(current_response)
             except Exception as e:
                 # Handle API errors gracefully
                 return f"Error during tool execution: {str(e)}"
@@ -209,21 +403,225 @@ Provide only the direct answer to what was asked.
         # Loop exited - extract final answer
         return self._extract_text_from_response(current_response)
 
-    def _extract_text_from_response(self, response):
+    def invalidate_cache(self):
+        """Drop all cached responses (e.g. after new course content is added)"""
+        self._response_cache.clear()
+        if self._semantic_cache is not None:
+            self._semantic_cache.clear()
+
+    async def _get_cached(
+        self, query: str, context_key: bytes, question: Optional[str] = None
+    ) -> Optional[str]:
+        """Look up an exact match first, then a semantically similar question"""
+        cached = self._response_cache.get(self._cache_key(query, context_key))
+        if cached is None and question is not None and self._semantic_cache is not None:
+            # Embedding runs the model on the CPU; keep it off the event loop
+            cached = await asyncio.to_thread(
+                self._semantic_cache.get, question, context_key
+            )
+        return cached
+
+    async def _set_cached(
+        self,
+        query: str,
+        context_key: bytes,
+        text: str,
+        question: Optional[str] = None,
+    ):
+        """Remember a direct answer in both caches"""
+        self._response_cache.set(self._cache_key(query, context_key), text)
+        if question is not None and self._semantic_cache is not None:
+            await asyncio.to_thread(
+                self._semantic_cache.set, question, context_key, text
+            )
+
+    def _context_key(
+        self, conversation_history: Optional[str], tools: Optional[List]
+    ) -> bytes:
+        """Digest of everything besides the query that determines a response"""
+        parts = [self.model, self.SYSTEM_PROMPT]
+        if conversation_history:
+            parts.append(conversation_history)
+        parts.append(self._prepare_tools(tools)[1] if tools else "[]")
+        return hashlib.blake2b("\x00".join(parts).encode()).digest()
+
+    @staticmethod
+    def _cache_key(query: str, context_key: bytes) -> bytes:
+        """Exact-match key for a query asked in a given context"""
+        return hashlib.blake2b(query.encode(), key=context_key).digest()
+
+    def _build_api_params(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        tools: Optional[List],
+    ) -> Dict[str, Any]:
+        """Build parameters for the first API call of a query"""
+        # Static system prompt is a cached block; history goes in a separate,
+        # uncached block so cache hits survive conversation changes
+        system_content = [self._SYSTEM_BLOCK]
+        if conversation_history:
+            history = self._truncate_history(conversation_history)
+            system_content.append(
+                {"type": "text", "text": self._HISTORY_PREFIX + history}
+            )
+
+        # Prepare API call parameters efficiently
+        api_params = {
+            **self.base_params,
+            "messages": [{"role": "user", "content": query}],
+            "system": system_content,
+        }
+
+        # Add tools if available
+        if tools:
+            api_params["tools"] = self._prepare_tools(tools)[0]
+            api_params["tool_choice"] = {"type": "auto"}
+
+        return api_params
+
+    def _truncate_history(self, history: str, max_tokens: Optional[int] = None) -> str:
+        """Keep only the most recent turns that fit within the token budget"""
+        max_chars = (max_tokens or self.MAX_HISTORY_TOKENS) * 4
+        if len(history) <= max_chars:
+            return history
+
+        turns = self._TURN_BOUNDARY.split(history)
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            used += len(turn) + 1
+            if used > max_chars:
+                break
+            kept.append(turn)
+
+        if not kept:
+            # A single oversized turn: keep its most recent text
+            kept.append(turns[-1][-max_chars:])
+
+        return self._HISTORY_OMITTED + "\n".join(reversed(kept))
+
+    def _next_round_params(
+        self, base_params: Dict[str, Any], messages: List, keep_tools: bool
+    ) -> Dict[str, Any]:
+        """Build parameters for a follow-up call after a tool round"""
+        next_params = {
+            **self.base_params,
+            "messages": messages,
+            "system": base_params["system"],
+        }
+        if keep_tools:
+            next_params["tools"] = base_params.get("tools", [])
+            next_params["tool_choice"] = {"type": "auto"}
+        return next_params
+
+    async def _execute_tools(self, response, tool_manager) -> List[Dict[str, Any]]:
+        """Run every tool Claude requested in a response concurrently"""
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        results = await tool_manager.aexecute_tools(
+            [(block.name, block.input) for block in tool_uses]
+        )
+
+        return [
+            {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": result,
+            }
+            for block, result in zip(tool_uses, results)
+        ]
+
+    def _append_tool_round(self, messages: List, response, tool_results: List):
+        """
+        Append a tool round to the conversation.
+
+        The prompt-cache breakpoint moves to the newest tool result so
+        follow-up rounds reuse the cached prefix without exceeding the
+        breakpoint limit.
+        """
+        # Assistant's response (contains tool_use blocks) is passed back as-is
+        assistant_message = {"role": "assistant", "content": response.content}
+        if not tool_results:
+            messages.append(assistant_message)
+            return
+
+        # Only our own tool_result dicts carry a breakpoint from earlier rounds
+        previous = messages[-1]
+        if previous["role"] == "user" and isinstance(previous["content"], list):
+            previous["content"][-1].pop("cache_control", None)
+        tool_results[-1]["cache_control"] = self.CACHE_CONTROL
+
+        # Add both messages of the round with a single extend
+        messages.extend((assistant_message, {"role": "user", "content": tool_results}))
+
+    async def _iter_stream_text(self, stream) -> AsyncIterator[str]:
+        """Yield text deltas from a stream, aborting if it stalls"""
+        events = stream.__aiter__()
+        while True:
+            try:
+                # Any event (including pings) proves the connection is alive
+                event = await asyncio.wait_for(
+                    anext(events), timeout=self.STREAM_STALL_TIMEOUT
+                )
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"No data received from Claude for {self.STREAM_STALL_TIMEOUT}s"
+                ) from None
+            if event.type == "text":
+                yield event.text
+
+    def _prepare_tools(self, tools: List) -> Tuple[List, str]:
+        """
+        Return tools with a cache breakpoint on the last schema, plus their
+        canonical JSON for cache keys, reusing the previous result when the
+        same list is passed again.
+        """
+        prepared = self._prepared_tools
+        if prepared is None or prepared[0] is not tools:
+            with_breakpoint = [
+                *tools[:-1],
+                {**tools[-1], "cache_control": self.CACHE_CONTROL},
+            ]
+            prepared = (tools, with_breakpoint, json.dumps(tools, sort_keys=True))
+            self._prepared_tools = prepared
+        return prepared[1], prepared[2]
+
+    def _extract_tokens(self, response) -> Dict[str, int]:
+        """
+        Record token usage, including prompt-cache reads, from a response.
+
+        Args:
+            response: Anthropic API response
+
+        Returns:
+            Token counts reported for this response
+        """
+        usage = getattr(response, "usage", None)
+        tokens = {}
+        for field in self.token_usage:
+            value = getattr(usage, field, None)
+            if isinstance(value, int):
+                tokens[field] = value
+                self.token_usage[field] += value
+        return tokens
+
+    @staticmethod
+    def _extract_text_from_response(response) -> str:
         """
         Extract text content from response, handling multiple content blocks.
 
+        Only text blocks contribute; the SDK already includes spacing in them.
+
         Args:
             response: Anthropic API response
 
         Returns:
             Extracted text as string
         """
-        text_parts = []
-        for block in response.content:
-            if hasattr(block, "type") and block.type == "text":
-                text_parts.append(block.text)
-            elif hasattr(block, "text"):
-                text_parts.append(block.text)
-
-        return " ".join(text_parts) if text_parts else ""
+        return "".join(
+            block.text
+            for block in response.content
+            if getattr(block, "type", None) == "text"
+        )
@@ -0,0 +1,165 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import orjson
+from config import config
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from rag_system import RAGSystem
+
+# API routes, kept apart from app.py so they can be mounted without building
+# the RAG system or serving the frontend
+router = APIRouter(prefix="/api")
+
+
+@lru_cache(maxsize=None)
+def _shared_rag_system() -> RAGSystem:
+    """Build the RAG system once, on first use"""
+    return RAGSystem(config)
+
+
+async def get_rag_system() -> RAGSystem:
+    """Dependency that provides the shared RAG system (overridable in tests)"""
+    # async so FastAPI calls it on the event loop, not via the threadpool
+    return _shared_rag_system()
+
+
+# Pydantic models for request/response
+class QueryRequest(BaseModel):
+    """Request model for course queries"""
+
+    query: str
+    session_id: Optional[str] = None
+
+
+class SourceItem(BaseModel):
+    """Model for a source with optional link"""
+
+    text: str
+    link: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    """Response model for course queries"""
+
+    answer: str
+    sources: List[SourceItem]
+    session_id: str
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for answering several independent queries"""
+
+    queries: List[str] = Field(max_length=config.MAX_BATCH_QUERIES)
+
+
+class BatchQueryItem(BaseModel):
+    """One answer in a batch query response; error is set if the query failed"""
+
+    answer: Optional[str] = None
+    sources: List[SourceItem] = []
+    error: Optional[str] = None
+
+
+class CourseStats(BaseModel):
+    """Response model for course statistics"""
+
+    total_courses: int
+    course_titles: List[str]
+
+
+def to_source_item(source: Union[str, Dict[str, Any]]) -> SourceItem:
+    """Normalize a tool source (bare title or text/link dict) to a SourceItem"""
+    if isinstance(source, str):
+        return SourceItem(text=source)
+    return SourceItem(**source)
+
+
+def to_batch_item(
+    result: Union[Tuple[str, List[Any]], Exception],
+) -> BatchQueryItem:
+    """Turn one aquery_batch result (answer and sources, or error) into an item"""
+    if isinstance(result, Exception):
+        return BatchQueryItem(error=str(result))
+    answer, sources = result
+    return BatchQueryItem(
+        answer=answer, sources=[to_source_item(source) for source in sources]
+    )
+
+
+# API Endpoints
+
+
+@router.post("/query", response_model=QueryResponse)
+async def query_documents(
+    request: QueryRequest, rag: RAGSystem = Depends(get_rag_system)
+):
+    """Process a query and return response with sources"""
+    try:
+        # Create session if not provided
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag.session_manager.create_session()
+
+        # Process query using RAG system
+        answer, sources = await rag.aquery(request.query, session_id)
+
+        return QueryResponse(
+            answer=answer,
+            sources=[to_source_item(source) for source in sources],
+            session_id=session_id,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/queries", response_model=List[BatchQueryItem])
+async def batch_query_documents(
+    request: BatchQueryRequest, rag: RAGSystem = Depends(get_rag_system)
+):
+    """Answer several independent queries concurrently (e.g. for evaluations)"""
+    try:
+        results = await rag.aquery_batch(request.queries)
+
+        return [to_batch_item(result) for result in results]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/query/stream")
+async def stream_query(request: QueryRequest, rag: RAGSystem = Depends(get_rag_system)):
+    """Stream the answer as newline-delimited JSON events while it is generated"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag.session_manager.create_session()
+
+    async def event_stream():
+        try:
+            async for event in rag.astream_query(request.query, session_id):
+                if event["type"] == "done":
+                    event["session_id"] = session_id
+                    # Same {text, link} shape as the non-streaming endpoints
+                    event["sources"] = [
+                        to_source_item(source).model_dump()
+                        for source in event["sources"]
+                    ]
+                yield orjson.dumps(event) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so report failures in-band
+            yield orjson.dumps({"type": "error", "detail": str(e)}) + b"\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@router.get("/courses", response_model=CourseStats)
+async def get_course_stats(rag: RAGSystem = Depends(get_rag_system)):
+    """Get course analytics and statistics"""
+    try:
+        analytics = rag.get_course_analytics()
+        return CourseStats(
+            total_courses=analytics["total_courses"],
+            course_titles=analytics["course_titles"],
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,20 +1,21 @@
 import os
 import warnings
-from typing import List, Optional, Union
 
-from config import config
-from fastapi import FastAPI, HTTPException
+from api import get_rag_system, router
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from rag_system import RAGSystem
 
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
-# Initialize FastAPI app
-app = FastAPI(title="Course Materials RAG System", root_path="")
+# Initialize FastAPI app (orjson encodes responses in C, not the stdlib json)
+app = FastAPI(
+    title="Course Materials RAG System",
+    root_path="",
+    default_response_class=ORJSONResponse,
+)
 
 # Add trusted host middleware for proxy
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
@@ -29,76 +30,15 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# Initialize RAG system
-rag_system = RAGSystem(config)
-
-
-# Pydantic models for request/response
-class QueryRequest(BaseModel):
-    """Request model for course queries"""
-
-    query: str
-    session_id: Optional[str] = None
-
-
-class SourceItem(BaseModel):
-    """Model for a source with optional link"""
-
-    text: str
-    link: Optional[str] = None
-
-
-class QueryResponse(BaseModel):
-    """Response model for course queries"""
-
-    answer: str
-    sources: List[Union[str, SourceItem]]
-    session_id: str
-
-
-class CourseStats(BaseModel):
-    """Response model for course statistics"""
-
-    total_courses: int
-    course_titles: List[str]
-
-
-# API Endpoints
-
-
-@app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
-    """Process a query and return response with sources"""
-    try:
-        # Create session if not provided
-        session_id = request.session_id
-        if not session_id:
-            session_id = rag_system.session_manager.create_session()
-
-        # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
-
-        return QueryResponse(answer=answer, sources=sources, session_id=session_id)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.get("/api/courses", response_model=CourseStats)
-async def get_course_stats():
-    """Get course analytics and statistics"""
-    try:
-        analytics = rag_system.get_course_analytics()
-        return CourseStats(
-            total_courses=analytics["total_courses"],
-            course_titles=analytics["course_titles"],
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# API routes; the RAG system behind them is built on first use
+app.include_router(router)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Load initial documents on startup"""
+    # Build the RAG system (and its embedding model) before the first request
+    rag_system = await get_rag_system()
     docs_path = "../docs"
     if os.path.exists(docs_path):
         print("Loading initial documents...")
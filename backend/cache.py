@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Guards the ordering updates; callers may run in worker threads
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries when full"""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticResponseCache:
+    """
+    Nearest-neighbour answer cache for near-duplicate questions.
+
+    Queries are embedded and compared by cosine similarity against every stored
+    query in one matrix-vector product. A stored answer is reused only when the
+    similarity clears the threshold and its context key (system prompt, history
+    and tools digest) matches exactly.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[Sequence[str]], Sequence[Any]],
+        threshold: float = 0.97,
+        maxsize: int = 10000,
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._embeddings: Optional[np.ndarray] = None  # maxsize x dim, unit rows
+        self._contexts: List[Optional[Hashable]] = []
+        self._answers: List[Any] = []
+        self._last_used: List[int] = []
+        self._clock = 0
+        # Embeddings of recently seen queries so a miss followed by set()
+        # only runs the model once
+        self._recent = TTLCache(maxsize=256, ttl=60.0)
+        self._lock = threading.Lock()
+
+    def get(self, query: str, context: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the answer stored for the most similar query, or default"""
+        if self.maxsize <= 0 or not self._answers:
+            return default
+
+        vector = self._embed(query)
+        with self._lock:
+            count = len(self._answers)
+            if not count:
+                return default
+
+            sims = self._embeddings[:count] @ vector
+            for row in np.argsort(sims)[::-1]:
+                if sims[row] < self.threshold:
+                    break
+                if self._contexts[row] == context:
+                    self._clock += 1
+                    self._last_used[row] = self._clock
+                    return self._answers[row]
+
+        return default
+
+    def set(self, query: str, context: Hashable, value: Any):
+        """Store an answer, replacing the least recently used one when full"""
+        if self.maxsize <= 0:
+            return
+
+        vector = self._embed(query)
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.zeros(
+                    (self.maxsize, vector.shape[0]), dtype=np.float32
+                )
+
+            self._clock += 1
+            if len(self._answers) < self.maxsize:
+                row = len(self._answers)
+                self._contexts.append(context)
+                self._answers.append(value)
+                self._last_used.append(self._clock)
+            else:
+                row = int(np.argmin(self._last_used))
+                self._contexts[row] = context
+                self._answers[row] = value
+                self._last_used[row] = self._clock
+
+            self._embeddings[row] = vector
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._contexts.clear()
+            self._answers.clear()
+            self._last_used.clear()
+        self._recent.clear()
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Unit-length embedding of a query, memoized briefly"""
+        vector = self._recent.get(query)
+        if vector is None:
+            vector = np.asarray(self.embed([query])[0], dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            self._recent.set(query, vector)
+        return vector
+
+    def __len__(self) -> int:
+        return len(self._answers)
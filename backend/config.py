@@ -7,9 +7,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration settings for the RAG system"""
+    """Configuration settings for the RAG system (read-only once created)"""
 
     # Anthropic API settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
@@ -26,6 +26,15 @@ class Config:
 
     # Tool calling settings
     MAX_TOOL_ROUNDS: int = 2  # Maximum sequential tool calling rounds
+    MAX_CONCURRENT_QUERIES: int = 20  # Batch queries in flight at once
+    MAX_BATCH_QUERIES: int = 100  # Most queries accepted in one batch request
+
+    # Response cache settings
+    RESPONSE_CACHE_SIZE: int = 2048  # Maximum cached answers (0 disables)
+    RESPONSE_CACHE_TTL: int = 3600  # Seconds before a cached answer expires
+    SEMANTIC_CACHE_SIZE: int = 0  # Reworded-question cache entries (0 disables)
+    SEMANTIC_CACHE_THRESHOLD: float = 0.97  # Cosine similarity to reuse an answer
+    SEARCH_CACHE_SIZE: int = 1024  # Cached vector searches (0 disables)
 
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
@@ -1,7 +1,9 @@
+import asyncio
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
-from ai_generator import AIGenerator
+from ai_generator import STREAM_RESET, AIGenerator
+from cache import SemanticResponseCache
 from document_processor import DocumentProcessor
 from models import Course
 from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
@@ -20,10 +22,25 @@ class RAGSystem:
             config.CHUNK_SIZE, config.CHUNK_OVERLAP
         )
         self.vector_store = VectorStore(
-            config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
+            config.CHROMA_PATH,
+            config.EMBEDDING_MODEL,
+            config.MAX_RESULTS,
+            cache_size=config.SEARCH_CACHE_SIZE,
         )
         self.ai_generator = AIGenerator(
-            config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            cache_size=config.RESPONSE_CACHE_SIZE,
+            cache_ttl=config.RESPONSE_CACHE_TTL,
+            semantic_cache=(
+                SemanticResponseCache(
+                    self.vector_store.embedding_function,
+                    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                    maxsize=config.SEMANTIC_CACHE_SIZE,
+                )
+                if config.SEMANTIC_CACHE_SIZE > 0
+                else None
+            ),
         )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
@@ -56,6 +73,9 @@ class RAGSystem:
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
 
+            # Cached answers may no longer reflect the catalog
+            self.ai_generator.invalidate_cache()
+
             return course, len(course_chunks)
         except Exception as e:
             print(f"Error processing course document {file_path}: {e}")
@@ -81,6 +101,7 @@ class RAGSystem:
         if clear_existing:
             print("Clearing existing data for fresh rebuild...")
             self.vector_store.clear_all_data()
+            self.ai_generator.invalidate_cache()
 
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
@@ -117,6 +138,10 @@ class RAGSystem:
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
 
+        # Cached answers may no longer reflect the catalog
+        if total_courses:
+            self.ai_generator.invalidate_cache()
+
         return total_courses, total_chunks
 
     def query(
@@ -132,6 +157,96 @@ class RAGSystem:
         Returns:
             Tuple of (response, sources list - empty for tool-based approach)
         """
+        # Generate response using AI with tools
+        response = self.ai_generator.generate_response(
+            **self._build_generation_params(query, session_id)
+        )
+
+        return self._finish_query(query, session_id, response)
+
+    async def aquery(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Async variant of query() that awaits the AI generator without blocking.
+
+        Sources are tracked in a per-request scope so concurrent queries
+        sharing the same tools never return each other's sources.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Returns:
+            Tuple of (response, sources list)
+        """
+        with self.tool_manager.source_scope():
+            response = await self.ai_generator.agenerate_response(
+                **self._build_generation_params(query, session_id)
+            )
+
+            return self._finish_query(query, session_id, response)
+
+    async def aquery_batch(
+        self, queries: List[str]
+    ) -> List[Union[Tuple[str, List[str]], Exception]]:
+        """
+        Answer independent queries concurrently, without session history.
+
+        Args:
+            queries: User questions
+
+        Returns:
+            (response, sources) tuples in the same order as queries; a query
+            that failed has the exception it raised in its place, so one error
+            doesn't discard the other answers
+        """
+        semaphore = asyncio.Semaphore(self.config.MAX_CONCURRENT_QUERIES)
+
+        async def answer(query: str) -> Tuple[str, List[str]]:
+            async with semaphore:
+                return await self.aquery(query)
+
+        # Each query runs in its own task, so its sources stay in its own scope
+        return await asyncio.gather(
+            *(answer(query) for query in queries), return_exceptions=True
+        )
+
+    async def astream_query(
+        self, query: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a query's answer as it is generated.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "text", "text": ...} events while the answer streams, a
+            {"type": "reset"} event when the text so far was only a lead-in to
+            tool calls, then a single {"type": "done", "sources": [...]} event
+        """
+        with self.tool_manager.source_scope():
+            chunks = []
+            async for text in self.ai_generator.stream_response(
+                **self._build_generation_params(query, session_id)
+            ):
+                if text is STREAM_RESET:
+                    chunks.clear()
+                    yield {"type": "reset"}
+                    continue
+                chunks.append(text)
+                yield {"type": "text", "text": text}
+
+            _, sources = self._finish_query(query, session_id, "".join(chunks))
+
+        yield {"type": "done", "sources": sources}
+
+    def _build_generation_params(
+        self, query: str, session_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """Build the AI generator arguments for a query"""
         # Create prompt for the AI with clear instructions
         prompt = f"""Answer this question about course materials: {query}"""
 
@@ -140,15 +255,19 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
-            max_tool_rounds=self.config.MAX_TOOL_ROUNDS,
-        )
+        return {
+            "query": prompt,
+            "conversation_history": history,
+            "tools": self.tool_manager.get_tool_definitions(),
+            "tool_manager": self.tool_manager,
+            "max_tool_rounds": self.config.MAX_TOOL_ROUNDS,
+            "question": query,
+        }
 
+    def _finish_query(
+        self, query: str, session_id: Optional[str], response: str
+    ) -> Tuple[str, List[str]]:
+        """Collect sources and record the exchange once a response is generated"""
         # Get sources from the search tool
         sources = self.tool_manager.get_last_sources()
 
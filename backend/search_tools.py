@@ -1,8 +1,23 @@
+import asyncio
+import inspect
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from vector_store import SearchResults, VectorStore
 
+# Sources recorded by tools for the current request, keyed by tool instance id.
+# Concurrent queries share the tool instances, so each one opens its own scope.
+_request_sources: ContextVar[Optional[Dict[int, List[Any]]]] = ContextVar(
+    "request_sources", default=None
+)
+# Sources recorded by one call of a concurrent tool round, as (tool, sources)
+# pairs; ToolManager.aexecute_tools merges them in call order
+_call_sources: ContextVar[Optional[List[Tuple["Tool", List[Any]]]]] = ContextVar(
+    "call_sources", default=None
+)
+
 
 class Tool(ABC):
     """Abstract base class for all tools"""
@@ -17,38 +32,53 @@ class Tool(ABC):
         """Execute the tool with given parameters"""
         pass
 
+    def _record_sources(self, sources: List[Any]):
+        """Store sources on the tool and in the active request scope, if any"""
+        call = _call_sources.get()
+        if call is not None:
+            call.append((self, sources))
+            return
+
+        self.last_sources = sources
+        scope = _request_sources.get()
+        if scope is not None:
+            scope[id(self)] = sources
+
 
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
 
+    # Static schema, built once per process rather than on every request
+    TOOL_DEFINITION: Dict[str, Any] = {
+        "name": "search_course_content",
+        "description": "Search course materials with smart course name matching and lesson filtering",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "What to search for in the course content",
+                },
+                "course_name": {
+                    "type": "string",
+                    "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
+                },
+                "lesson_number": {
+                    "type": "integer",
+                    "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
+                },
+            },
+            "required": ["query"],
+        },
+    }
+
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
         self.last_sources: List[Any] = []  # Track sources from last search
 
     def get_tool_definition(self) -> Dict[str, Any]:
-        """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "search_course_content",
-            "description": "Search course materials with smart course name matching and lesson filtering",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "What to search for in the course content",
-                    },
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
-                    },
-                    "lesson_number": {
-                        "type": "integer",
-                        "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
-                    },
-                },
-                "required": ["query"],
-            },
-        }
+        """Return Anthropic tool definition for this tool (shared, read-only)"""
+        return self.TOOL_DEFINITION
 
     def execute(
         self,
@@ -117,7 +147,7 @@ class CourseSearchTool(Tool):
             formatted.append(f"{header}\n{doc}")
 
         # Store sources for retrieval
-        self.last_sources = sources
+        self._record_sources(sources)
 
         return "\n\n".join(formatted)
 
@@ -125,26 +155,28 @@ class CourseSearchTool(Tool):
 class CourseOutlineTool(Tool):
     """Tool for retrieving course outline information"""
 
+    TOOL_DEFINITION: Dict[str, Any] = {
+        "name": "get_course_outline",
+        "description": "Get complete course outline including title, course link, instructor, and all lessons with their titles",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "course_name": {
+                    "type": "string",
+                    "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
+                }
+            },
+            "required": ["course_name"],
+        },
+    }
+
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
         self.last_sources: List[Any] = []  # Track sources from last outline request
 
     def get_tool_definition(self) -> Dict[str, Any]:
-        """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "get_course_outline",
-            "description": "Get complete course outline including title, course link, instructor, and all lessons with their titles",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
-                    }
-                },
-                "required": ["course_name"],
-            },
-        }
+        """Return Anthropic tool definition for this tool (shared, read-only)"""
+        return self.TOOL_DEFINITION
 
     def execute(self, course_name: str) -> str:
         """
@@ -175,7 +207,7 @@ class CourseOutlineTool(Tool):
 
         # Track source with course link
         source = {"text": course_title, "link": course_link if course_link else None}
-        self.last_sources = [source]
+        self._record_sources([source])
 
         # Build formatted output
         formatted = [f"Course: {course_title}"]
@@ -197,7 +229,10 @@ class ToolManager:
     """Manages available tools for the AI"""
 
     def __init__(self):
-        self.tools = {}
+        self.tools: Dict[str, Tool] = {}  # keyed by definition name
+        # Definitions are static once registered; build the list once so
+        # callers can recognise it by identity
+        self._definitions: Optional[list] = None
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -206,20 +241,98 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._definitions = None
 
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """Get all tool definitions for Anthropic tool calling (shared, read-only)"""
+        if self._definitions is None:
+            self._definitions = [
+                tool.get_tool_definition() for tool in self.tools.values()
+            ]
+        return self._definitions
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
-        if tool_name not in self.tools:
+        tool = self.tools.get(tool_name)
+        if tool is None:
             return f"Tool '{tool_name}' not found"
 
-        return self.tools[tool_name].execute(**kwargs)
+        return tool.execute(**kwargs)
+
+    @contextmanager
+    def source_scope(self) -> Iterator[None]:
+        """Track sources per request so concurrent queries don't mix them up"""
+        token = _request_sources.set({})
+        try:
+            yield
+        finally:
+            try:
+                _request_sources.reset(token)
+            except ValueError:
+                # Closed from another context (e.g. an abandoned streaming
+                # generator finalized later); that context never saw the scope
+                pass
+
+    async def aexecute_tool(self, tool_name: str, **kwargs) -> str:
+        """
+        Execute a tool by name without blocking the event loop.
+
+        Coroutine tools are awaited directly; blocking tools (vector store
+        searches) run in a worker thread so several can run at once.
+        """
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return f"Tool '{tool_name}' not found"
+
+        if inspect.iscoroutinefunction(tool.execute):
+            return await tool.execute(**kwargs)
+        return await asyncio.to_thread(tool.execute, **kwargs)
+
+    async def aexecute_tools(
+        self, calls: Sequence[Tuple[str, Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        Execute one round of (tool name, arguments) calls concurrently.
+
+        Calls finish in any order, so each records its sources privately; the
+        sources of every call are then stored per tool in call order. A round
+        that searches two courses keeps both searches' sources.
+
+        Returns:
+            Tool results in the same order as calls
+        """
+        recorded: List[List[Tuple[Tool, List[Any]]]] = [[] for _ in calls]
+
+        async def run(tool_name: str, kwargs: Dict[str, Any], record: List) -> str:
+            # gather runs each call in its own task, so this stays call-local
+            _call_sources.set(record)
+            return await self.aexecute_tool(tool_name, **kwargs)
+
+        results = await asyncio.gather(
+            *(
+                run(tool_name, kwargs, record)
+                for (tool_name, kwargs), record in zip(calls, recorded)
+            )
+        )
+
+        merged: Dict[int, Tuple[Tool, List[Any]]] = {}
+        for record in recorded:
+            for tool, sources in record:
+                merged.setdefault(id(tool), (tool, []))[1].extend(sources)
+        for tool, sources in merged.values():
+            tool._record_sources(sources)
+
+        return results
 
     def get_last_sources(self) -> list:
         """Get sources from the last search operation"""
+        scope = _request_sources.get()
+        if scope is not None:
+            for tool in self.tools.values():
+                if scope.get(id(tool)):
+                    return scope[id(tool)]
+            return []
+
         # Check all tools for last_sources attribute
         for tool in self.tools.values():
             if hasattr(tool, "last_sources") and tool.last_sources:
@@ -228,6 +341,10 @@ class ToolManager:
 
     def reset_sources(self):
         """Reset sources from all tools that track sources"""
+        scope = _request_sources.get()
+        if scope is not None:
+            scope.clear()
+
         for tool in self.tools.values():
             if hasattr(tool, "last_sources"):
                 tool.last_sources = []
@@ -2,65 +2,126 @@
 Pytest fixtures for RAG system tests.
 """
 
-import sys
-from pathlib import Path
-from unittest.mock import Mock
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import Mock, call, patch
 
 import pytest
+from ai_generator import AIGenerator
+from api import get_rag_system, router
+from config import Config
+from models import Course, CourseChunk, Lesson
+from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
+from vector_store import SearchResults
 
-# Add backend directory to path for imports
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
 
-from models import Course, CourseChunk, Lesson  # noqa: E402
-from vector_store import SearchResults  # noqa: E402
+# Lightweight stand-ins for the SDK's content blocks and message
+@dataclass(slots=True)
+class ToolUseBlock:
+    name: str
+    id: str
+    input: dict
+    type: str = "tool_use"
 
 
-@pytest.fixture
-def mock_vector_store():
-    """Create a mock VectorStore for testing."""
-    store = Mock()
+@dataclass(slots=True)
+class TextBlock:
+    text: str
+    type: str = "text"
+
+
+@dataclass(slots=True)
+class FakeResponse:
+    stop_reason: str
+    content: list = field(default_factory=list)
+    usage: Any = None
+
+
+def tool_use_response(name: str, tool_id: str, tool_input: dict) -> FakeResponse:
+    """Build a response in which Claude asks for a single tool call."""
+    return FakeResponse("tool_use", [ToolUseBlock(name, tool_id, tool_input)])
+
+
+def text_response(text: str, stop_reason: str = "end_turn") -> FakeResponse:
+    """Build a response containing a single text block."""
+    return FakeResponse(stop_reason, [TextBlock(text)])
+
+
+def anthropic_client_mock() -> Mock:
+    """Mock client exposing only the messages API that AIGenerator calls."""
+    # spec_set stops typos and stray lookups from growing child mocks
+    client = Mock(spec_set=["messages"])
+    client.messages = Mock(spec_set=["create", "stream"])
+    return client
+
+
+# Canned search results, built once and shared (SearchResults is frozen)
+EMPTY_RESULTS = SearchResults(documents=[], metadata=[], distances=[])
+ERROR_RESULTS = SearchResults.empty("Search error occurred")
+LESSON_5_RESULTS = SearchResults(
+    documents=[
+        "This is content from lesson 5 about MCP client.",
+        "The lesson covers client setup and connection.",
+    ],
+    metadata=[
+        {
+            "course_title": "MCP Course",
+            "lesson_number": 5,
+            "chunk_index": 0,
+        },
+        {
+            "course_title": "MCP Course",
+            "lesson_number": 5,
+            "chunk_index": 1,
+        },
+    ],
+    distances=[0.1, 0.2],
+)
+
+
+class FakeVectorStore:
+    """
+    Stand-in for VectorStore implementing only what the search tools call.
+
+    Calls to search and get_course_outline are appended to calls as
+    unittest.mock.call objects, e.g. call.get_course_outline("MCP").
+    """
 
-    # Mock successful search results
-    def mock_search(
+    def __init__(self):
+        self.calls = []
+
+    def reset(self):
+        """Forget recorded calls."""
+        self.calls.clear()
+
+    def search(
+        self,
         query: str,
         course_name: str = None,
         lesson_number: int = None,
         limit: int = None,
-    ):
-        # Simulate search results
+    ) -> SearchResults:
+        self.calls.append(
+            call.search(
+                query=query, course_name=course_name, lesson_number=lesson_number
+            )
+        )
+
         if "empty" in query.lower():
-            return SearchResults(documents=[], metadata=[], distances=[])
+            return EMPTY_RESULTS
 
         if "error" in query.lower():
-            return SearchResults.empty("Search error occurred")
+            return ERROR_RESULTS
 
-        # Return sample results
-        return SearchResults(
-            documents=[
-                "This is content from lesson 5 about MCP client.",
-                "The lesson covers client setup and connection.",
-            ],
-            metadata=[
-                {
-                    "course_title": "MCP Course",
-                    "lesson_number": 5,
-                    "chunk_index": 0,
-                },
-                {
-                    "course_title": "MCP Course",
-                    "lesson_number": 5,
-                    "chunk_index": 1,
-                },
-            ],
-            distances=[0.1, 0.2],
-        )
+        return LESSON_5_RESULTS
 
-    store.search = Mock(side_effect=mock_search)
-    store.get_lesson_link = Mock(return_value="https://example.com/lesson/5")
+    def get_lesson_link(self, course_title: str, lesson_number: int) -> str:
+        return "https://example.com/lesson/5"
+
+    def get_course_outline(self, course_name: str):
+        self.calls.append(call.get_course_outline(course_name))
 
-    # Mock course outline retrieval
-    def mock_get_course_outline(course_name: str):
         if course_name.lower() == "nonexistent":
             return None
         return {
@@ -86,12 +147,28 @@ def mock_vector_store():
             ],
         }
 
-    store.get_course_outline = Mock(side_effect=mock_get_course_outline)
 
-    return store
+@pytest.fixture(scope="session")
+def mock_vector_store():
+    """Create a fake VectorStore for testing."""
+    return FakeVectorStore()
+
 
+@pytest.fixture(scope="module")
+def tool_bundle(mock_vector_store):
+    """
+    ToolManager with both course tools, plus its tool definitions.
 
-@pytest.fixture
+    Returns:
+        (tool manager, tool definitions list)
+    """
+    tool_manager = ToolManager()
+    tool_manager.register_tool(CourseSearchTool(mock_vector_store))
+    tool_manager.register_tool(CourseOutlineTool(mock_vector_store))
+    return tool_manager, tool_manager.get_tool_definitions()
+
+
+@pytest.fixture(scope="session")
 def sample_course():
     """Create a sample course for testing."""
     return Course(
@@ -118,7 +195,7 @@ def sample_course():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_chunks():
     """Create sample course chunks for testing."""
     return [
@@ -137,79 +214,20 @@ def sample_chunks():
     ]
 
 
-@pytest.fixture
-def mock_anthropic_client():
-    """Create a mock Anthropic client for testing."""
-    client = Mock()
-
-    # Mock successful API response with tool use
-    def mock_create_with_tool(**kwargs):
-        response = Mock()
-        response.stop_reason = "tool_use"
-
-        # Create tool use content block
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.id = "tool_123"
-        tool_use_block.input = {
-            "query": "What is covered in lesson 5",
-            "course_name": "MCP",
-            "lesson_number": 5,
-        }
-
-        response.content = [tool_use_block]
-        return response
-
-    # Mock final response after tool execution
-    def mock_create_final(**kwargs):
-        response = Mock()
-        response.stop_reason = "end_turn"
-
-        # Create text content block
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "Lesson 5 covers MCP client creation and setup."
-
-        response.content = [text_block]
-        return response
-
-    # Configure the mock to return different responses
-    client.messages.create = Mock(
-        side_effect=[
-            mock_create_with_tool(),  # First call - tool use
-            mock_create_final(),  # Second call - final answer
-        ]
-    )
-
-    return client
-
-
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_config():
-    """Create a mock configuration for testing."""
-    config = Mock()
-    config.ANTHROPIC_API_KEY = "test_api_key"
-    config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-    config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-    config.CHUNK_SIZE = 800
-    config.CHUNK_OVERLAP = 100
-    config.MAX_RESULTS = 5
-    config.MAX_HISTORY = 2
-    config.CHROMA_PATH = "./test_chroma_db"
-    return config
+    """Create the test configuration: defaults plus a fake key and DB path."""
+    return Config(ANTHROPIC_API_KEY="test_api_key", CHROMA_PATH="./test_chroma_db")
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_rag_system():
-    """Create a mock RAGSystem for API testing."""
-    rag = Mock()
+    """Create the default RAGSystem behaviour for API testing."""
+    # Plain functions; mock_rag wraps them so tests can override per call
+    rag = SimpleNamespace()
 
     # Mock query response
-    def mock_query(query: str, session_id: str = None):
-        if "error" in query.lower():
-            raise Exception("Mock RAG error")
-
+    async def mock_aquery(query: str, session_id: str = None):
         return (
             "This is a mock answer to your question.",
             [
@@ -218,82 +236,109 @@ def mock_rag_system():
             ],
         )
 
-    rag.query = Mock(side_effect=mock_query)
+    rag.aquery = mock_aquery
+
+    # Mock batch query response
+    async def mock_aquery_batch(queries):
+        return [await mock_aquery(query) for query in queries]
+
+    rag.aquery_batch = mock_aquery_batch
 
     # Mock course analytics
     def mock_get_course_analytics():
         return {"total_courses": 2, "course_titles": ["Course A", "Course B"]}
 
-    rag.get_course_analytics = Mock(side_effect=mock_get_course_analytics)
+    rag.get_course_analytics = mock_get_course_analytics
+
+    # Mock streamed query events
+    async def mock_astream_query(query: str, session_id: str = None):
+        for text in ("This is a mock ", "answer to your question."):
+            yield {"type": "text", "text": text}
+        yield {
+            "type": "done",
+            "sources": [{"text": "Source 1", "link": "https://example.com/lesson/1"}],
+        }
+
+    rag.astream_query = mock_astream_query
 
     # Mock session manager
-    session_manager = Mock()
-    session_manager.create_session = Mock(return_value="test_session_123")
-    rag.session_manager = session_manager
+    rag.session_manager = SimpleNamespace(create_session=lambda: "test_session_123")
 
     return rag
 
 
 @pytest.fixture
-def test_client(mock_rag_system):
-    """Create a FastAPI test client with mocked dependencies."""
-    from typing import List, Optional, Union
+def mock_rag(mock_rag_system):
+    """
+    Per-test RAG system mock that delegates to the default behaviour.
+
+    Set e.g. mock_rag.aquery.side_effect = Exception(...) to exercise errors.
+    """
+    return Mock(wraps=mock_rag_system)
+
 
+@pytest.fixture(scope="session")
+def test_app():
+    """
+    Serve the production API routes, built once per session.
+
+    The app skips app.py's static file mount and startup document loading;
+    test_client overrides api.get_rag_system so no real RAG system is built.
+    """
     from fastapi import FastAPI
-    from fastapi.testclient import TestClient
-    from pydantic import BaseModel
+    from fastapi.responses import ORJSONResponse
+
+    test_app = FastAPI(title="Test RAG System", default_response_class=ORJSONResponse)
+    test_app.include_router(router)
+    return test_app
+
 
-    # Create test app without static file mounting
-    test_app = FastAPI(title="Test RAG System")
+@pytest.fixture(scope="session")
+def _session_client(test_app):
+    """One TestClient (and app lifespan) shared by the whole session."""
+    from fastapi.testclient import TestClient
 
-    # Use the mock RAG system
-    test_rag = mock_rag_system
+    with TestClient(test_app) as client:
+        yield client
 
-    # Pydantic models
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
 
-    class SourceItem(BaseModel):
-        text: str
-        link: Optional[str] = None
+@pytest.fixture
+def test_client(_session_client, test_app, mock_rag):
+    """Return the shared test client, serving this test's mock_rag."""
+    _session_client.cookies.clear()
+    test_app.dependency_overrides[get_rag_system] = lambda: mock_rag
+    yield _session_client
+    test_app.dependency_overrides.clear()
 
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[Union[str, SourceItem]]
-        session_id: str
 
-    class CourseStats(BaseModel):
-        total_courses: int
-        course_titles: List[str]
+@pytest.fixture(scope="session")
+def _anthropic_class():
+    """Patch the Anthropic client class once for the whole session."""
+    with patch("ai_generator.anthropic.AsyncAnthropic") as cls:
+        yield cls
 
-    # Define test endpoints
-    @test_app.post("/api/query", response_model=QueryResponse)
-    async def query_documents(request: QueryRequest):
-        from fastapi import HTTPException
 
-        try:
-            session_id = request.session_id
-            if not session_id:
-                session_id = test_rag.session_manager.create_session()
+@pytest.fixture(autouse=True)
+def mock_anthropic(_anthropic_class):
+    """
+    Give each test a fresh mock client from the patched Anthropic class.
 
-            answer, sources = test_rag.query(request.query, session_id)
+    Yields:
+        (patched class, the client instance AIGenerator will receive)
+    """
+    _anthropic_class.reset_mock()
+    client = anthropic_client_mock()
+    _anthropic_class.return_value = client
+    yield _anthropic_class, client
 
-            return QueryResponse(answer=answer, sources=sources, session_id=session_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
 
-    @test_app.get("/api/courses", response_model=CourseStats)
-    async def get_course_stats():
-        from fastapi import HTTPException
+@pytest.fixture(autouse=True)
+def _reset_shared_mocks(mock_vector_store):
+    """Clear call history on the session-scoped vector store before each test."""
+    mock_vector_store.reset()
 
-        try:
-            analytics = test_rag.get_course_analytics()
-            return CourseStats(
-                total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"],
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
 
-    return TestClient(test_app)
+@pytest.fixture
+def ai_gen(mock_anthropic):
+    """AIGenerator whose client is this test's mock Anthropic client."""
+    return AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
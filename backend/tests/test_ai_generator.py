@@ -2,165 +2,169 @@
 Tests for ai_generator.py - Verify AI correctly calls tools.
 """
 
-import sys
-from pathlib import Path
-from unittest.mock import Mock, patch
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, call
 
+import ai_generator
+import httpx
 import pytest
+from ai_generator import AIGenerator
+from anthropic import AsyncAnthropic
+from cache import SemanticResponseCache
+from search_tools import CourseSearchTool, Tool, ToolManager
 
-# Add backend to path
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
+from .conftest import (
+    FakeResponse,
+    TextBlock,
+    ToolUseBlock,
+    text_response,
+    tool_use_response,
+)
 
-from ai_generator import AIGenerator  # noqa: E402
-from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager  # noqa: E402
+
+class _FakeStream:
+    """Stand-in for the SDK's async message stream context manager."""
+
+    def __init__(self, texts, final_message, delay=0.0):
+        self.texts = texts
+        self.final_message = final_message
+        self.delay = delay
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for text in self.texts:
+            await asyncio.sleep(self.delay)
+            yield TextBlock(text)
+
+    async def get_final_message(self):
+        return self.final_message
+
+
+class _SleepingTool(Tool):
+    """Async tool that sleeps and records how many tools were running at once."""
+
+    def __init__(self, name, tracker):
+        self.name = name
+        self.tracker = tracker
+
+    def get_tool_definition(self):
+        return {"name": self.name, "input_schema": {"type": "object"}}
+
+    async def execute(self):
+        self.tracker.in_flight += 1
+        self.tracker.peak = max(self.tracker.peak, self.tracker.in_flight)
+        await asyncio.sleep(0.05)
+        self.tracker.in_flight -= 1
+        return f"{self.name} done"
 
 
 class TestAIGeneratorToolCalling:
     """Tests for AIGenerator's tool calling functionality."""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_calling_for_content_query(
-        self, mock_anthropic_class, mock_vector_store
+    @pytest.mark.parametrize(
+        "tool_name, tool_input, expected_call, final_text",
+        [
+            pytest.param(
+                "search_course_content",
+                {
+                    "query": "What is covered in lesson 5",
+                    "course_name": "MCP",
+                    "lesson_number": 5,
+                },
+                call.search(
+                    query="What is covered in lesson 5",
+                    course_name="MCP",
+                    lesson_number=5,
+                ),
+                "Lesson 5 covers MCP client creation.",
+                id="search-all-parameters",
+            ),
+            pytest.param(
+                "search_course_content",
+                {"query": "test"},
+                call.search(query="test", course_name=None, lesson_number=None),
+                "Answer after one tool",
+                id="search-query-only",
+            ),
+            pytest.param(
+                "get_course_outline",
+                {"course_name": "MCP"},
+                call.get_course_outline("MCP"),
+                "The MCP course has three lessons.",
+                id="outline",
+            ),
+        ],
+    )
+    def test_single_tool_round_then_answer(
+        self,
+        mock_anthropic,
+        mock_vector_store,
+        ai_gen,
+        tool_bundle,
+        tool_name,
+        tool_input,
+        expected_call,
+        final_text,
     ):
-        """Test that AI correctly invokes CourseSearchTool for content queries."""
-        # Setup mocks
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # First response: AI decides to use tool
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.id = "tool_123"
-        tool_use_block.input = {
-            "query": "What is covered in lesson 5",
-            "course_name": "MCP",
-            "lesson_number": 5,
-        }
-        tool_response.content = [tool_use_block]
-
-        # Second response: AI provides final answer
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "Lesson 5 covers MCP client creation."
-        final_response.content = [text_block]
-
-        mock_client.messages.create = Mock(side_effect=[tool_response, final_response])
-
-        # Create AI generator and tool manager
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        """Test the tool_use -> tool result -> end_turn flow for each tool."""
+        _, mock_client = mock_anthropic
+        mock_client.messages.create = AsyncMock(
+            side_effect=[
+                tool_use_response(tool_name, "tool_1", tool_input),
+                text_response(final_text),
+            ]
+        )
 
-        tool_manager = ToolManager()
-        search_tool = CourseSearchTool(mock_vector_store)
-        tool_manager.register_tool(search_tool)
+        tool_manager, tools = tool_bundle
 
-        # Execute
         result = ai_gen.generate_response(
             query="What is covered in lesson 5 of MCP course?",
-            tools=tool_manager.get_tool_definitions(),
+            tools=tools,
             tool_manager=tool_manager,
+            max_tool_rounds=2,
         )
 
-        # Assertions
-        assert result == "Lesson 5 covers MCP client creation."
+        # Claude stopped on its own after one round
+        assert result == final_text
         assert mock_client.messages.create.call_count == 2
-        mock_vector_store.search.assert_called_once()
+        # Parameters reach the vector store unchanged
+        assert mock_vector_store.calls == [expected_call]
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_no_tool_calling_for_general_query(self, mock_anthropic_class):
+        # The tool result is passed back on the second call
+        messages = mock_client.messages.create.call_args_list[1][1]["messages"]
+        assert len(messages) >= 2
+        tool_msg = messages[-1]
+        assert tool_msg["role"] == "user"
+        assert any(block.get("type") == "tool_result" for block in tool_msg["content"])
+
+    def test_no_tool_calling_for_general_query(self, mock_anthropic, ai_gen):
         """Test that AI doesn't use tools for general knowledge queries."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        _, mock_client = mock_anthropic
 
         # AI responds directly without tools
-        response = Mock()
-        response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "RAG stands for Retrieval-Augmented Generation."
-        response.content = [text_block]
+        response = text_response("RAG stands for Retrieval-Augmented Generation.")
 
-        mock_client.messages.create = Mock(return_value=response)
-
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        mock_client.messages.create = AsyncMock(return_value=response)
 
         result = ai_gen.generate_response(query="What is RAG?")
 
         assert result == "RAG stands for Retrieval-Augmented Generation."
         assert mock_client.messages.create.call_count == 1
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_parameters_extracted_correctly(
-        self, mock_anthropic_class, mock_vector_store
-    ):
-        """Test that tool parameters are correctly extracted and passed."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # Setup tool response with specific parameters
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.id = "tool_456"
-        tool_use_block.input = {
-            "query": "client setup",
-            "course_name": "MCP Course",
-            "lesson_number": 5,
-        }
-        tool_response.content = [tool_use_block]
-
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.text = "Client setup details..."
-        final_response.content = [text_block]
-
-        mock_client.messages.create = Mock(side_effect=[tool_response, final_response])
-
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
-
-        tool_manager = ToolManager()
-        search_tool = CourseSearchTool(mock_vector_store)
-        tool_manager.register_tool(search_tool)
-
-        ai_gen.generate_response(
-            query="Tell me about client setup",
-            tools=tool_manager.get_tool_definitions(),
-            tool_manager=tool_manager,
-        )
-
-        # Verify search was called with correct parameters
-        mock_vector_store.search.assert_called_once_with(
-            query="client setup", course_name="MCP Course", lesson_number=5
-        )
-
-    @patch("ai_generator.anthropic.Anthropic")
     def test_tool_definitions_formatted_correctly(
-        self, mock_anthropic_class, mock_vector_store
+        self, mock_anthropic, mock_vector_store, ai_gen
     ):
         """Test that tool definitions are properly passed to API."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        _, mock_client = mock_anthropic
 
-        response = Mock()
-        response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.text = "Response"
-        response.content = [text_block]
-        mock_client.messages.create = Mock(return_value=response)
-
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        response = text_response("Response")
+        mock_client.messages.create = AsyncMock(return_value=response)
 
         tool_manager = ToolManager()
         search_tool = CourseSearchTool(mock_vector_store)
@@ -180,21 +184,12 @@ class TestAIGeneratorToolCalling:
         assert len(call_args[1]["tools"]) > 0
         assert call_args[1]["tools"][0]["name"] == "search_course_content"
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_conversation_history_included(self, mock_anthropic_class):
+    def test_conversation_history_included(self, mock_anthropic, ai_gen):
         """Test that conversation history is included in API calls."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        _, mock_client = mock_anthropic
 
-        response = Mock()
-        response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.text = "Response with context"
-        response.content = [text_block]
-        mock_client.messages.create = Mock(return_value=response)
-
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        response = text_response("Response with context")
+        mock_client.messages.create = AsyncMock(return_value=response)
 
         history = "User: Previous question\nAssistant: Previous answer"
 
@@ -202,130 +197,98 @@ class TestAIGeneratorToolCalling:
             query="Follow-up question", conversation_history=history
         )
 
-        # Verify history was included in system prompt
+        # Verify history was included in an uncached system block
         call_args = mock_client.messages.create.call_args
-        system_content = call_args[1]["system"]
-        assert "Previous question" in system_content
-        assert "Previous answer" in system_content
+        prompt_block, history_block = call_args[1]["system"]
+        assert "cache_control" in prompt_block
+        assert "cache_control" not in history_block
+        assert "Previous question" in history_block["text"]
+        assert "Previous answer" in history_block["text"]
+
+    def test_long_history_keeps_latest_turns(self, ai_gen):
+        """Test that history over the token budget keeps only recent turns."""
+        history = "\n".join(
+            f"User: Question {i} {'x' * 40}\nAssistant: Answer {i}" for i in range(20)
+        )
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_api_error_handling(self, mock_anthropic_class):
-        """Test handling of API errors."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        trimmed = ai_gen._truncate_history(history, max_tokens=40)
 
-        # Simulate API error
-        mock_client.messages.create = Mock(side_effect=Exception("API Error"))
+        assert len(trimmed) <= len(ai_gen._HISTORY_OMITTED) + 160
+        assert trimmed.startswith(ai_gen._HISTORY_OMITTED)
+        assert trimmed.endswith("Assistant: Answer 19")
+        assert "Question 0 " not in trimmed
+        assert ai_gen._truncate_history("User: Hi", max_tokens=40) == "User: Hi"
 
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+    def test_prompt_caching_breakpoints(self, mock_anthropic, ai_gen, tool_bundle):
+        """Test that system prompt and tool schemas are marked for caching."""
+        _, mock_client = mock_anthropic
 
-        with pytest.raises(Exception) as exc_info:
-            ai_gen.generate_response(query="Test query")
+        response = text_response("Response")
+        response.usage = SimpleNamespace(
+            input_tokens=10,
+            output_tokens=5,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=900,
+        )
+        mock_client.messages.create = AsyncMock(return_value=response)
 
-        assert "API Error" in str(exc_info.value)
+        tool_manager, tools = tool_bundle
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_result_passed_back_to_api(
-        self, mock_anthropic_class, mock_vector_store
-    ):
-        """Test that tool results are properly passed back to the API."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.id = "tool_789"
-        tool_use_block.input = {"query": "test"}
-        tool_response.content = [tool_use_block]
-
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.text = "Final answer"
-        final_response.content = [text_block]
-
-        mock_client.messages.create = Mock(side_effect=[tool_response, final_response])
+        ai_gen.generate_response(query="Test", tools=tools, tool_manager=tool_manager)
 
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        call_kwargs = mock_client.messages.create.call_args[1]
+        assert call_kwargs["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert call_kwargs["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in call_kwargs["tools"][0]
+        # Caller's tool definitions are left untouched
+        assert "cache_control" not in tools[-1]
+        assert ai_gen.token_usage["cache_read_input_tokens"] == 900
 
-        tool_manager = ToolManager()
-        search_tool = CourseSearchTool(mock_vector_store)
-        tool_manager.register_tool(search_tool)
+        # The prepared tools are reused for the same definitions list
+        ai_gen.invalidate_cache()
+        ai_gen.generate_response(query="Test", tools=tools, tool_manager=tool_manager)
+        assert mock_client.messages.create.call_args[1]["tools"] is call_kwargs["tools"]
 
-        ai_gen.generate_response(
-            query="Test",
-            tools=tool_manager.get_tool_definitions(),
-            tool_manager=tool_manager,
-        )
+    def test_api_error_handling(self, mock_anthropic, ai_gen):
+        """Test handling of API errors."""
+        _, mock_client = mock_anthropic
 
-        # Verify second API call included tool results
-        assert mock_client.messages.create.call_count == 2
-        second_call_args = mock_client.messages.create.call_args_list[1]
+        # Simulate API error
+        mock_client.messages.create = AsyncMock(side_effect=Exception("API Error"))
 
-        # Check that messages include tool results
-        messages = second_call_args[1]["messages"]
-        assert (
-            len(messages) >= 2
-        )  # Should have user message, assistant message, and tool result
-        assert any("tool_result" in str(msg) for msg in messages)
+        with pytest.raises(Exception, match="API Error"):
+            ai_gen.generate_response(query="Test query")
 
-    @patch("ai_generator.anthropic.Anthropic")
     def test_sequential_tool_calling_two_rounds(
-        self, mock_anthropic_class, mock_vector_store
+        self, mock_anthropic, ai_gen, tool_bundle
     ):
         """Test that Claude can make 2 sequential tool calls."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        _, mock_client = mock_anthropic
 
         # First API call: initial query with tool use
-        first_response = Mock()
-        first_response.stop_reason = "tool_use"
-        tool_use_1 = Mock()
-        tool_use_1.type = "tool_use"
-        tool_use_1.name = "get_course_outline"
-        tool_use_1.id = "tool_1"
-        tool_use_1.input = {"course_name": "MCP"}
-        first_response.content = [tool_use_1]
+        first_response = tool_use_response(
+            "get_course_outline", "tool_1", {"course_name": "MCP"}
+        )
 
         # Second API call: after first tool, Claude wants another tool
-        second_response = Mock()
-        second_response.stop_reason = "tool_use"
-        tool_use_2 = Mock()
-        tool_use_2.type = "tool_use"
-        tool_use_2.name = "search_course_content"
-        tool_use_2.id = "tool_2"
-        tool_use_2.input = {"query": "lesson 3", "course_name": "MCP"}
-        second_response.content = [tool_use_2]
+        second_response = tool_use_response(
+            "search_course_content",
+            "tool_2",
+            {"query": "lesson 3", "course_name": "MCP"},
+        )
 
         # Third API call: final answer
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "Here's the outline and lesson 3 content"
-        final_response.content = [text_block]
-
-        mock_client.messages.create = Mock(
+        final_response = text_response("Here's the outline and lesson 3 content")
+
+        mock_client.messages.create = AsyncMock(
             side_effect=[first_response, second_response, final_response]
         )
 
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
-
-        tool_manager = ToolManager()
-        search_tool = CourseSearchTool(mock_vector_store)
-        outline_tool = CourseOutlineTool(mock_vector_store)
-        tool_manager.register_tool(search_tool)
-        tool_manager.register_tool(outline_tool)
+        tool_manager, tools = tool_bundle
 
         result = ai_gen.generate_response(
             query="Show me MCP outline and lesson 3",
-            tools=tool_manager.get_tool_definitions(),
+            tools=tools,
             tool_manager=tool_manager,
             max_tool_rounds=2,
         )
@@ -339,32 +302,20 @@ class TestAIGeneratorToolCalling:
         assert "tools" in second_call[1]
         assert len(second_call[1]["tools"]) > 0
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_max_rounds_enforced(self, mock_anthropic_class, mock_vector_store):
+    def test_max_rounds_enforced(self, mock_anthropic, mock_vector_store, ai_gen):
         """Test that max rounds limit is enforced."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        _, mock_client = mock_anthropic
 
         # Claude always wants to use tools
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_use = Mock()
-        tool_use.type = "tool_use"
-        tool_use.name = "search_course_content"
-        tool_use.id = "tool_x"
-        tool_use.input = {"query": "test"}
-        tool_response.content = [tool_use]
+        tool_response = tool_use_response(
+            "search_course_content", "tool_x", {"query": "test"}
+        )
 
         # Final response after forced synthesis
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "Forced final answer"
-        final_response.content = [text_block]
+        final_response = text_response("Forced final answer")
 
         # Return tool_use twice, then final answer
-        mock_client.messages.create = Mock(
+        mock_client.messages.create = AsyncMock(
             side_effect=[
                 tool_response,  # Initial: wants tool
                 tool_response,  # Round 1: wants tool again
@@ -372,9 +323,6 @@ class TestAIGeneratorToolCalling:
             ]
         )
 
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
-
         tool_manager = ToolManager()
         search_tool = CourseSearchTool(mock_vector_store)
         tool_manager.register_tool(search_tool)
@@ -395,48 +343,374 @@ class TestAIGeneratorToolCalling:
 
         assert result == "Forced final answer"
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_natural_termination_after_one_tool(
-        self, mock_anthropic_class, mock_vector_store
-    ):
-        """Test that Claude can naturally stop after one tool if satisfied."""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # First response: wants tool
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_use = Mock()
-        tool_use.type = "tool_use"
-        tool_use.name = "search_course_content"
-        tool_use.id = "tool_1"
-        tool_use.input = {"query": "test"}
-        tool_response.content = [tool_use]
-
-        # Second response: provides answer (natural stop)
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        text_block = Mock()
-        text_block.type = "text"
-        text_block.text = "Answer after one tool"
-        final_response.content = [text_block]
-
-        mock_client.messages.create = Mock(side_effect=[tool_response, final_response])
+    def test_single_round_fast_path(self, mock_vector_store, ai_gen):
+        """Test that max_tool_rounds=1 runs tools once then answers without tools."""
+        tool_response = tool_use_response(
+            "search_course_content", "tool_1", {"query": "lesson 5"}
+        )
 
-        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        ai_gen.client = mock_client
+        final_response = text_response("Single round answer")
+
+        ai_gen.client.messages.create = AsyncMock(
+            side_effect=[tool_response, final_response]
+        )
 
         tool_manager = ToolManager()
-        search_tool = CourseSearchTool(mock_vector_store)
-        tool_manager.register_tool(search_tool)
+        tool_manager.register_tool(CourseSearchTool(mock_vector_store))
 
         result = ai_gen.generate_response(
-            query="Simple query",
+            query="What is in lesson 5?",
             tools=tool_manager.get_tool_definitions(),
             tool_manager=tool_manager,
-            max_tool_rounds=2,
+            max_tool_rounds=1,
         )
 
-        # Only 2 API calls (didn't use second round)
+        assert result == "Single round answer"
+        final_call = ai_gen.client.messages.create.call_args_list[1][1]
+        assert "tools" not in final_call
+        assert [m["role"] for m in final_call["messages"]] == [
+            "user",
+            "assistant",
+            "user",
+        ]
+        assert final_call["messages"][2]["content"][0]["tool_use_id"] == "tool_1"
+
+    def test_multiple_tools_in_one_round(
+        self, mock_anthropic, mock_vector_store, ai_gen, tool_bundle
+    ):
+        """Test that all tools requested in one turn run and keep their order."""
+        _, mock_client = mock_anthropic
+
+        tool_response = FakeResponse(
+            "tool_use",
+            [
+                ToolUseBlock(
+                    "get_course_outline", "tool_outline", {"course_name": "MCP"}
+                ),
+                ToolUseBlock(
+                    "search_course_content", "tool_search", {"query": "lesson 5"}
+                ),
+            ],
+        )
+
+        final_response = text_response("Combined answer")
+
+        mock_client.messages.create = AsyncMock(
+            side_effect=[tool_response, final_response]
+        )
+
+        tool_manager, tools = tool_bundle
+
+        result = ai_gen.generate_response(
+            query="Outline and lesson 5",
+            tools=tools,
+            tool_manager=tool_manager,
+        )
+
+        assert result == "Combined answer"
+        tool_results = mock_client.messages.create.call_args_list[1][1]["messages"][-1][
+            "content"
+        ]
+        assert [r["tool_use_id"] for r in tool_results] == [
+            "tool_outline",
+            "tool_search",
+        ]
+        assert tool_results[0]["content"].startswith("Course:")
+        # The tools may run concurrently, so compare regardless of order
+        assert sorted(c[0] for c in mock_vector_store.calls) == [
+            "get_course_outline",
+            "search",
+        ]
+
+    async def test_tools_in_one_round_overlap(self, mock_anthropic, ai_gen):
+        """Test that the tools requested in one turn run concurrently."""
+        _, mock_client = mock_anthropic
+        names = ["tool_a", "tool_b", "tool_c"]
+        tracker = SimpleNamespace(in_flight=0, peak=0)
+
+        tool_manager = ToolManager()
+        for name in names:
+            tool_manager.register_tool(_SleepingTool(name, tracker))
+
+        mock_client.messages.create = AsyncMock(
+            side_effect=[
+                FakeResponse(
+                    "tool_use", [ToolUseBlock(name, f"id_{name}", {}) for name in names]
+                ),
+                text_response("Done"),
+            ]
+        )
+
+        result = await ai_gen.agenerate_response(
+            query="Run all tools",
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
+        )
+
+        assert result == "Done"
+        assert tracker.peak == len(names)
+
+    def test_extract_text_joins_only_text_blocks(self):
+        """Test that only text blocks contribute to the extracted answer."""
+        response = FakeResponse(
+            "end_turn",
+            [
+                TextBlock("Lesson 5 "),
+                ToolUseBlock("search_course_content", "tool_1", {"query": "lesson 5"}),
+                TextBlock("covers MCP."),
+            ],
+        )
+
+        result = AIGenerator._extract_text_from_response(response)
+
+        assert result == "Lesson 5 covers MCP."
+
+    async def test_agenerate_response_awaits_client(self, mock_anthropic, ai_gen):
+        """Test that the async API awaits the client without a sync wrapper."""
+        _, mock_client = mock_anthropic
+
+        response = text_response("Async answer")
+        mock_client.messages.create = AsyncMock(return_value=response)
+
+        result = await ai_gen.agenerate_response(query="What is RAG?")
+
+        assert result == "Async answer"
+        mock_client.messages.create.assert_awaited_once()
+
+
+class TestAIGeneratorResponseCache:
+    """Tests for AIGenerator's response cache."""
+
+    def test_repeated_query_served_from_cache(self, ai_gen):
+        """Test that an identical query does not call the API twice."""
+        ai_gen.client.messages.create = AsyncMock(
+            return_value=text_response("RAG is retrieval.")
+        )
+
+        first = ai_gen.generate_response(query="What is RAG?")
+        second = ai_gen.generate_response(query="What is RAG?")
+
+        assert first == second == "RAG is retrieval."
+        assert ai_gen.client.messages.create.call_count == 1
+
+    def test_history_is_part_of_cache_key(self, ai_gen):
+        """Test that different conversation history misses the cache."""
+        ai_gen.client.messages.create = AsyncMock(return_value=text_response("Answer"))
+
+        ai_gen.generate_response(query="Why?")
+        ai_gen.generate_response(query="Why?", conversation_history="User: Hi")
+
+        assert ai_gen.client.messages.create.call_count == 2
+
+    def test_tool_answers_not_cached(self, mock_vector_store, ai_gen):
+        """Test that answers produced with tool results are not cached."""
+        tool_response = tool_use_response(
+            "search_course_content", "tool_1", {"query": "lesson 5"}
+        )
+
+        ai_gen.client.messages.create = AsyncMock(
+            side_effect=[
+                tool_response,
+                text_response("From tools"),
+                tool_response,
+                text_response("From tools"),
+            ]
+        )
+
+        tool_manager = ToolManager()
+        tool_manager.register_tool(CourseSearchTool(mock_vector_store))
+        tools = tool_manager.get_tool_definitions()
+
+        for _ in range(2):
+            ai_gen.generate_response(
+                query="Lesson 5?", tools=tools, tool_manager=tool_manager
+            )
+
+        assert ai_gen.client.messages.create.call_count == 4
+
+    def test_invalidate_cache(self, ai_gen):
+        """Test that invalidate_cache forces a fresh API call."""
+        ai_gen.client.messages.create = AsyncMock(return_value=text_response("Answer"))
+
+        ai_gen.generate_response(query="What is RAG?")
+        ai_gen.invalidate_cache()
+        ai_gen.generate_response(query="What is RAG?")
+
+        assert ai_gen.client.messages.create.call_count == 2
+
+    def test_reworded_query_served_from_semantic_cache(self, mock_anthropic):
+        """Test that a near-duplicate question reuses the cached answer."""
+        _, mock_client = mock_anthropic
+        vectors = {"What is RAG?": [1.0, 0.0], "Explain RAG": [0.99, 0.02]}
+        semantic_cache = SemanticResponseCache(
+            lambda texts: [vectors[text] for text in texts], threshold=0.97
+        )
+        ai_gen = AIGenerator(
+            api_key="test_key",
+            model="claude-sonnet-4-20250514",
+            semantic_cache=semantic_cache,
+        )
+        mock_client.messages.create = AsyncMock(
+            return_value=text_response("RAG is retrieval.")
+        )
+
+        # Only the raw questions are embedded, never the templated prompts
+        first = ai_gen.generate_response(
+            query="Answer this question: What is RAG?", question="What is RAG?"
+        )
+        second = ai_gen.generate_response(
+            query="Answer this question: Explain RAG", question="Explain RAG"
+        )
+
+        assert first == second == "RAG is retrieval."
+        assert mock_client.messages.create.call_count == 1
+
+    def test_follow_up_skips_semantic_cache(self, mock_anthropic):
+        """Test that questions asked with history are not matched by meaning."""
+        _, mock_client = mock_anthropic
+        embed = Mock(return_value=[[1.0, 0.0]])
+        ai_gen = AIGenerator(
+            api_key="test_key",
+            model="claude-sonnet-4-20250514",
+            semantic_cache=SemanticResponseCache(embed, threshold=0.97),
+        )
+        mock_client.messages.create = AsyncMock(return_value=text_response("More"))
+
+        for question in ("Tell me more", "Go on"):
+            ai_gen.generate_response(
+                query=question,
+                question=question,
+                conversation_history="User: What is RAG?",
+            )
+
         assert mock_client.messages.create.call_count == 2
-        assert result == "Answer after one tool"
+        embed.assert_not_called()
+
+
+class TestAIGeneratorStreaming:
+    """Tests for AIGenerator.stream_response()."""
+
+    async def test_stream_yields_text_across_tool_rounds(
+        self, mock_vector_store, ai_gen
+    ):
+        """Test that tool-round lead-in text is retracted before the answer."""
+        tool_message = tool_use_response(
+            "search_course_content", "tool_1", {"query": "lesson 5"}
+        )
+
+        final_message = FakeResponse("end_turn")
+
+        ai_gen.client.messages.stream = Mock(
+            side_effect=[
+                _FakeStream(["Let me search. "], tool_message),
+                _FakeStream(["Lesson 5 ", "covers MCP."], final_message),
+            ]
+        )
+
+        tool_manager = ToolManager()
+        tool_manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        chunks = [
+            chunk
+            async for chunk in ai_gen.stream_response(
+                query="What is in lesson 5?",
+                tools=tool_manager.get_tool_definitions(),
+                tool_manager=tool_manager,
+            )
+        ]
+
+        assert chunks == [
+            "Let me search. ",
+            ai_generator.STREAM_RESET,
+            "Lesson 5 ",
+            "covers MCP.",
+        ]
+        assert mock_vector_store.calls == [
+            call.search(query="lesson 5", course_name=None, lesson_number=None)
+        ]
+        assert ai_gen.client.messages.stream.call_count == 2
+        second_call = ai_gen.client.messages.stream.call_args_list[1]
+        assert second_call[1]["messages"][-1]["content"][0]["type"] == "tool_result"
+
+    async def test_stream_stall_raises_timeout(self, ai_gen):
+        """Test that a stalled stream is abandoned instead of hanging."""
+        final_message = FakeResponse("end_turn")
+
+        ai_gen.STREAM_STALL_TIMEOUT = 0.01
+        ai_gen.client.messages.stream = Mock(
+            return_value=_FakeStream(["never"], final_message, delay=1.0)
+        )
+
+        with pytest.raises(TimeoutError):
+            async for _ in ai_gen.stream_response(query="Test"):
+                pass
+
+
+class TestAIGeneratorSyncWrapper:
+    """Tests for the synchronous generate_response wrapper."""
+
+    @pytest.fixture
+    def requests_seen(self, monkeypatch):
+        """
+        Serve real SDK clients from an in-process transport.
+
+        Returns:
+            List of (client number, event loop) for every request sent, where
+            clients are numbered in the order AIGenerator creates them
+        """
+        seen = []
+
+        def transport_for(client_number):
+            def handler(request):
+                seen.append((client_number, asyncio.get_running_loop()))
+                return httpx.Response(
+                    200,
+                    json={
+                        "id": "msg_1",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": "claude-sonnet-4-20250514",
+                        "content": [{"type": "text", "text": "hi"}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": 1, "output_tokens": 1},
+                    },
+                )
+
+            return httpx.MockTransport(handler)
+
+        clients_created = iter(range(100))
+        # Real SDK client instead of the patched class
+        monkeypatch.setattr(ai_generator.anthropic, "AsyncAnthropic", AsyncAnthropic)
+        monkeypatch.setattr(
+            ai_generator.anthropic,
+            "DefaultAsyncHttpxClient",
+            lambda **kwargs: httpx.AsyncClient(
+                transport=transport_for(next(clients_created))
+            ),
+        )
+        return seen
+
+    def test_repeated_sync_calls_share_a_live_event_loop(self, requests_seen):
+        """Test that sync calls keep using the loop the client's pool is bound to."""
+        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
+
+        assert ai_gen.generate_response(query="First") == "hi"
+        assert ai_gen.generate_response(query="Second") == "hi"
+
+        (first_client, first_loop), (second_client, second_loop) = requests_seen
+        assert first_client == second_client
+        assert first_loop is second_loop
+        assert not first_loop.is_closed()
+
+    async def test_sync_call_after_async_use_gets_its_own_client(self, requests_seen):
+        """Test that the sync wrapper never reuses the async client's pool."""
+        ai_gen = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
+
+        assert await ai_gen.agenerate_response(query="First") == "hi"
+        assert ai_gen.generate_response(query="Second") == "hi"
+
+        (async_client, async_loop), (sync_client, sync_loop) = requests_seen
+        assert async_client != sync_client
+        assert async_loop is asyncio.get_running_loop()
+        assert sync_loop is not async_loop
@@ -3,10 +3,64 @@ API endpoint tests for the RAG system.
 Tests the FastAPI endpoints for proper request/response handling.
 """
 
+import inspect
+import json
+from unittest.mock import Mock
+
+import api
 import pytest
+from api import SourceItem, get_rag_system, router, to_source_item
 from fastapi.testclient import TestClient
 
 
+class TestRAGSystemDependency:
+    """Tests for how the routes obtain the RAG system."""
+
+    def test_routes_depend_on_get_rag_system(self):
+        """Test that every API route is wired to the shared dependency."""
+        for route in router.routes:
+            calls = [dependency.call for dependency in route.dependant.dependencies]
+            assert get_rag_system in calls, route.path
+
+    def test_dependency_skips_the_threadpool(self):
+        """Test that FastAPI awaits the dependency instead of offloading it."""
+        assert inspect.iscoroutinefunction(get_rag_system)
+
+    async def test_rag_system_built_once_and_shared(self, monkeypatch):
+        """Test that the RAG system is built lazily, once, from the config."""
+        rag_class = Mock()
+        monkeypatch.setattr(api, "RAGSystem", rag_class)
+        api._shared_rag_system.cache_clear()
+        try:
+            first, second = await get_rag_system(), await get_rag_system()
+        finally:
+            api._shared_rag_system.cache_clear()
+
+        assert first is second is rag_class.return_value
+        rag_class.assert_called_once_with(api.config)
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        pytest.param("MCP Course", SourceItem(text="MCP Course"), id="title"),
+        pytest.param(
+            {"text": "MCP Course - Lesson 5", "link": "https://example.com/5"},
+            SourceItem(text="MCP Course - Lesson 5", link="https://example.com/5"),
+            id="dict",
+        ),
+        pytest.param(
+            {"text": "MCP Course", "link": None},
+            SourceItem(text="MCP Course"),
+            id="no-link",
+        ),
+    ],
+)
+def test_to_source_item(source, expected):
+    """Test that bare titles and text/link dicts both become SourceItems."""
+    assert to_source_item(source) == expected
+
+
 class TestQueryEndpoint:
     """Tests for /api/query endpoint."""
 
@@ -43,6 +97,27 @@ class TestQueryEndpoint:
         # Should use provided session ID
         assert data["session_id"] == "existing_session"
 
+    def test_query_calls_aquery(self, test_client, mock_rag):
+        """Test that the endpoint awaits the async query with the session."""
+        test_client.post(
+            "/api/query",
+            json={"query": "What is MCP?", "session_id": "existing_session"},
+        )
+
+        mock_rag.aquery.assert_called_once_with("What is MCP?", "existing_session")
+
+    def test_query_with_bare_title_source(self, test_client, mock_rag):
+        """Test that a source given as a plain title gets a null link."""
+
+        async def answer_with_title(query, session_id):
+            return "Answer", ["MCP Course"]
+
+        mock_rag.aquery.side_effect = answer_with_title
+
+        response = test_client.post("/api/query", json={"query": "What is MCP?"})
+
+        assert response.json()["sources"] == [{"text": "MCP Course", "link": None}]
+
     def test_query_with_empty_string(self, test_client):
         """Test query endpoint with empty query string."""
         response = test_client.post("/api/query", json={"query": ""})
@@ -60,14 +135,18 @@ class TestQueryEndpoint:
     def test_query_with_invalid_json(self, test_client):
         """Test query endpoint with invalid JSON."""
         response = test_client.post(
-            "/api/query", data="not json", headers={"Content-Type": "application/json"}
+            "/api/query",
+            content="not json",
+            headers={"Content-Type": "application/json"},
         )
 
         # Should return validation error
         assert response.status_code == 422
 
-    def test_query_with_rag_error(self, test_client):
+    def test_query_with_rag_error(self, test_client, mock_rag):
         """Test query endpoint when RAG system raises an error."""
+        mock_rag.aquery.side_effect = Exception("Mock RAG error")
+
         response = test_client.post(
             "/api/query", json={"query": "trigger error in query"}
         )
@@ -96,6 +175,122 @@ class TestQueryEndpoint:
             assert "link" in source
 
 
+class TestBatchQueryEndpoint:
+    """Tests for /api/queries endpoint."""
+
+    def test_batch_returns_answer_per_query(self, test_client, mock_rag):
+        """Test that each query in the batch gets an answer, in order."""
+        response = test_client.post(
+            "/api/queries", json={"queries": ["What is MCP?", "Who teaches it?"]}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 2
+        assert all(item["answer"] for item in data)
+        assert data[0]["sources"][0]["text"] == "Source 1"
+        mock_rag.aquery_batch.assert_called_once_with(
+            ["What is MCP?", "Who teaches it?"]
+        )
+
+    def test_batch_over_limit_rejected(self, test_client, mock_rag):
+        """Test that a batch larger than MAX_BATCH_QUERIES is refused."""
+        queries = ["What is MCP?"] * (api.config.MAX_BATCH_QUERIES + 1)
+
+        response = test_client.post("/api/queries", json={"queries": queries})
+
+        assert response.status_code == 422
+        mock_rag.aquery_batch.assert_not_called()
+
+    def test_failed_query_reported_per_item(self, test_client, mock_rag):
+        """Test that one failing query doesn't discard the other answers."""
+
+        async def one_failure(queries):
+            return [("Answer", ["MCP Course"]), Exception("Overloaded")]
+
+        mock_rag.aquery_batch.side_effect = one_failure
+
+        response = test_client.post(
+            "/api/queries", json={"queries": ["What is MCP?", "trigger error"]}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "answer": "Answer",
+                "sources": [{"text": "MCP Course", "link": None}],
+                "error": None,
+            },
+            {"answer": None, "sources": [], "error": "Overloaded"},
+        ]
+
+    def test_batch_error_returns_500(self, test_client, mock_rag):
+        """Test that a failure outside any single query fails the request."""
+        mock_rag.aquery_batch.side_effect = Exception("Mock RAG error")
+
+        response = test_client.post(
+            "/api/queries", json={"queries": ["What is MCP?", "trigger error"]}
+        )
+
+        assert response.status_code == 500
+
+
+class TestQueryStreamEndpoint:
+    """Tests for /api/query/stream endpoint."""
+
+    def _events(self, response):
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    def test_stream_emits_text_then_done(self, test_client, mock_rag):
+        """Test that text events arrive before a final done event."""
+        response = test_client.post("/api/query/stream", json={"query": "What is MCP?"})
+
+        assert response.status_code == 200
+        assert "application/x-ndjson" in response.headers["content-type"]
+
+        events = self._events(response)
+        text = "".join(e["text"] for e in events if e["type"] == "text")
+        assert text == "This is a mock answer to your question."
+
+        done = events[-1]
+        assert done["type"] == "done"
+        assert done["session_id"] == "test_session_123"
+        assert done["sources"][0]["text"] == "Source 1"
+        mock_rag.astream_query.assert_called_once_with(
+            "What is MCP?", "test_session_123"
+        )
+
+    def test_stream_normalizes_sources(self, test_client, mock_rag):
+        """Test that done-event sources have the same shape as /api/query's."""
+
+        async def raw_sources(query, session_id):
+            yield {
+                "type": "done",
+                "sources": ["MCP Course", {"text": "Lesson 5", "link": "https://x"}],
+            }
+
+        mock_rag.astream_query.side_effect = raw_sources
+
+        response = test_client.post("/api/query/stream", json={"query": "What?"})
+
+        assert self._events(response)[-1]["sources"] == [
+            {"text": "MCP Course", "link": None},
+            {"text": "Lesson 5", "link": "https://x"},
+        ]
+
+    def test_stream_reports_errors_in_band(self, test_client, mock_rag):
+        """Test that failures after streaming starts are sent as error events."""
+        mock_rag.astream_query.side_effect = Exception("Mock RAG error")
+
+        response = test_client.post(
+            "/api/query/stream", json={"query": "trigger error in query"}
+        )
+
+        assert response.status_code == 200
+        events = self._events(response)
+        assert events[-1] == {"type": "error", "detail": "Mock RAG error"}
+
+
 class TestCoursesEndpoint:
     """Tests for /api/courses endpoint."""
 
@@ -188,8 +383,10 @@ class TestAPIIntegration:
         assert response.status_code == 200
         assert "application/json" in response.headers["content-type"]
 
-    def test_api_error_response_format(self, test_client):
+    def test_api_error_response_format(self, test_client, mock_rag):
         """Test that API errors follow FastAPI error format."""
+        mock_rag.aquery.side_effect = Exception("Mock RAG error")
+
         response = test_client.post(
             "/api/query", json={"query": "trigger error in query"}
         )
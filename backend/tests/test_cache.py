@@ -0,0 +1,120 @@
+"""
+Tests for cache.py - TTL/LRU and semantic caches used for responses.
+"""
+
+from unittest.mock import Mock, patch
+
+from cache import SemanticResponseCache, TTLCache
+
+# Two phrasings of the same question point in almost the same direction
+EMBEDDINGS = {
+    "what's in lesson 5?": [1.0, 0.0, 0.0],
+    "tell me about lesson 5": [0.99, 0.05, 0.0],
+    "who teaches the course?": [0.0, 1.0, 0.0],
+    "how long is the course?": [0.0, 0.0, 1.0],
+}
+
+
+def fake_embed(texts):
+    return [EMBEDDINGS[text] for text in texts]
+
+
+class TestTTLCache:
+    """Tests for TTLCache."""
+
+    def test_set_and_get(self):
+        """Test that stored values are returned."""
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        cache.set("a", "answer")
+
+        assert cache.get("a") == "answer"
+        assert cache.get("missing") is None
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after their TTL."""
+        cache = TTLCache(maxsize=2, ttl=10)
+
+        with patch("cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+
+        assert len(cache) == 0
+
+    def test_zero_size_disables_cache(self):
+        """Test that maxsize=0 stores nothing."""
+        cache = TTLCache(maxsize=0, ttl=60)
+
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+
+class TestSemanticResponseCache:
+    """Tests for SemanticResponseCache."""
+
+    def test_similar_query_hits(self):
+        """Test that a reworded question reuses the stored answer."""
+        cache = SemanticResponseCache(fake_embed, threshold=0.97)
+
+        cache.set("what's in lesson 5?", b"ctx", "Lesson 5 covers MCP.")
+
+        assert cache.get("tell me about lesson 5", b"ctx") == "Lesson 5 covers MCP."
+        assert cache.get("who teaches the course?", b"ctx") is None
+
+    def test_context_must_match(self):
+        """Test that a similar query in a different context misses."""
+        cache = SemanticResponseCache(fake_embed, threshold=0.97)
+
+        cache.set("what's in lesson 5?", b"ctx", "Lesson 5 covers MCP.")
+
+        assert cache.get("tell me about lesson 5", b"other") is None
+
+    def test_least_recently_used_replaced(self):
+        """Test that the least recently used entry is replaced when full."""
+        cache = SemanticResponseCache(fake_embed, threshold=0.97, maxsize=2)
+        cache.set("what's in lesson 5?", b"ctx", "MCP")
+        cache.set("who teaches the course?", b"ctx", "Andrew")
+
+        cache.get("what's in lesson 5?", b"ctx")
+        cache.set("how long is the course?", b"ctx", "2 hours")
+
+        assert len(cache) == 2
+        assert cache.get("what's in lesson 5?", b"ctx") == "MCP"
+        assert cache.get("who teaches the course?", b"ctx") is None
+        assert cache.get("how long is the course?", b"ctx") == "2 hours"
+
+    def test_query_embedded_once_for_miss_then_set(self):
+        """Test that a lookup followed by a store only embeds the query once."""
+        embed = Mock(side_effect=fake_embed)
+        cache = SemanticResponseCache(embed, threshold=0.97)
+        cache.set("who teaches the course?", b"ctx", "Andrew")
+
+        cache.get("what's in lesson 5?", b"ctx")
+        cache.set("what's in lesson 5?", b"ctx", "MCP")
+
+        assert embed.call_count == 2
+
+    def test_clear(self):
+        """Test that clear removes all entries."""
+        cache = SemanticResponseCache(fake_embed, threshold=0.97)
+        cache.set("what's in lesson 5?", b"ctx", "MCP")
+
+        cache.clear()
+
+        assert len(cache) == 0
+        assert cache.get("what's in lesson 5?", b"ctx") is None
@@ -3,15 +3,9 @@ Integration tests - Test against real components to identify actual failures.
 """
 
 import os
-import sys
-from pathlib import Path
 
 import pytest
 
-# Add backend to path
-backend_path = Path(__file__).parent.parent / "backend"
-sys.path.insert(0, str(backend_path))
-
 # Set environment variable for testing
 os.environ["ANTHROPIC_API_KEY"] = os.getenv("ANTHROPIC_API_KEY", "test_key")
 
@@ -19,18 +13,24 @@ from config import config  # noqa: E402
 from search_tools import CourseSearchTool  # noqa: E402
 from vector_store import SearchResults, VectorStore  # noqa: E402
 
+# Loading the embedding model and real database is slow; opt in explicitly
+pytestmark = pytest.mark.skipif(
+    not os.getenv("RUN_INTEGRATION"), reason="set RUN_INTEGRATION=1"
+)
+
+
+@pytest.fixture(scope="module")
+def store():
+    """Open the real vector store once for all tests in this module."""
+    return VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
+
 
 @pytest.mark.integration
 class TestVectorStoreIntegration:
     """Integration tests for VectorStore with real ChromaDB."""
 
-    def test_vector_store_with_actual_data(self):
+    def test_vector_store_with_actual_data(self, store):
         """Test that vector store has data loaded."""
-        # Use actual vector store
-        store = VectorStore(
-            config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
-        )
-
         # Check course count
         course_count = store.get_course_count()
         print("\n[VECTOR STORE STATUS]")
@@ -50,12 +50,8 @@ class TestVectorStoreIntegration:
 
         assert isinstance(results, SearchResults)
 
-    def test_course_search_tool_with_real_db(self):
+    def test_course_search_tool_with_real_db(self, store):
         """Test CourseSearchTool with actual database."""
-        store = VectorStore(
-            config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
-        )
-
         course_count = store.get_course_count()
         if course_count == 0:
             pytest.skip("No courses loaded")
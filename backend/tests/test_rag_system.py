@@ -2,339 +2,284 @@
 Tests for rag_system.py - End-to-end content query testing.
 """
 
-import sys
-from pathlib import Path
+import asyncio
+from contextlib import ExitStack
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
 import pytest
-
-# Add backend to path
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
-
-from rag_system import RAGSystem  # noqa: E402
+import rag_system
+from ai_generator import STREAM_RESET, AIGenerator
+from document_processor import DocumentProcessor
+from rag_system import RAGSystem
+from session_manager import SessionManager
+from vector_store import VectorStore
+
+
+@pytest.fixture(scope="class")
+def rag_env(mock_config):
+    """
+    Build one RAGSystem for the class with its collaborators patched.
+
+    The collaborator mocks are spec_set against the real classes, so misspelt
+    attributes fail and async methods come back as AsyncMocks.
+
+    Yields:
+        (RAG system, namespace with the vector store (vs), AI generator (ai),
+        session manager (sm) and document processor (dp) mock instances, plus
+        source-tracking stubs (tm) that rag_factory installs on the tool manager)
+    """
+    mocks = SimpleNamespace(
+        # embedding_function is set in VectorStore.__init__, not on the class
+        vs=Mock(spec_set=[*dir(VectorStore), "embedding_function"]),
+        ai=Mock(spec_set=AIGenerator),
+        sm=Mock(spec_set=SessionManager),
+        dp=Mock(spec_set=DocumentProcessor),
+        tm=Mock(spec_set=["get_last_sources", "reset_sources"]),
+    )
+
+    with ExitStack() as stack:
+        for name, instance in (
+            ("VectorStore", mocks.vs),
+            ("AIGenerator", mocks.ai),
+            ("SessionManager", mocks.sm),
+            ("DocumentProcessor", mocks.dp),
+        ):
+            stack.enter_context(patch.object(rag_system, name, return_value=instance))
+        yield RAGSystem(mock_config), mocks
 
 
 class TestRAGSystemContentQueries:
     """Tests for end-to-end content query handling."""
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_content_query_complete_flow(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test complete flow of content query from input to response."""
-        # Setup mocks
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
-
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(
-            return_value="Lesson 5 covers MCP client creation."
-        )
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_sm_instance = Mock()
-        mock_sm_instance.get_conversation_history = Mock(return_value=None)
-        mock_sm_instance.add_exchange = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
-
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
-
-        # Create RAG system
-        rag = RAGSystem(mock_config)
-
-        # Mock tool manager to return sources
-        rag.tool_manager.get_last_sources = Mock(
-            return_value=[
-                {
-                    "text": "MCP Course - Lesson 5",
-                    "link": "https://example.com/lesson/5",
-                }
-            ]
-        )
-        rag.tool_manager.reset_sources = Mock()
-
-        # Execute query
-        response, sources = rag.query(
-            "What is covered in lesson 5 of MCP course?", session_id="test_session"
-        )
-
-        # Assertions
-        assert response == "Lesson 5 covers MCP client creation."
-        assert len(sources) > 0
-        assert sources[0]["text"] == "MCP Course - Lesson 5"
+    @pytest.fixture(autouse=True)
+    def rag_mocks(self, rag_env):
+        """The shared collaborator mocks, with calls and configuration cleared."""
+        _, mocks = rag_env
+        for mock in vars(mocks).values():
+            mock.reset_mock(return_value=True, side_effect=True)
+        return mocks
+
+    @pytest.fixture
+    def rag_factory(self, rag_env, rag_mocks, monkeypatch):
+        """
+        Configure the shared RAGSystem for one test.
+
+        Returns:
+            configure(response=None, sources=None) -> RAGSystem, which sets the
+            generated answer and stubs the tool manager's source tracking
+        """
+        rag, _ = rag_env
+
+        def configure(response=None, sources=None):
+            if response is not None:
+                rag_mocks.ai.generate_response.return_value = response
+            if sources is not None:
+                rag_mocks.tm.get_last_sources.return_value = sources
+                for name in ("get_last_sources", "reset_sources"):
+                    monkeypatch.setattr(
+                        rag.tool_manager, name, getattr(rag_mocks.tm, name)
+                    )
+            return rag
+
+        return configure
+
+    @pytest.mark.parametrize(
+        "query,response,sources",
+        [
+            pytest.param(
+                "What is covered in lesson 5 of MCP course?",
+                "Lesson 5 covers MCP client creation.",
+                [
+                    {
+                        "text": "MCP Course - Lesson 5",
+                        "link": "https://example.com/lesson/5",
+                    }
+                ],
+                id="content",
+            ),
+            pytest.param(
+                "What is the outline of MCP course?",
+                "Course outline: Lesson 0, Lesson 1, Lesson 5",
+                [{"text": "MCP Course", "link": "https://example.com/course"}],
+                id="outline",
+            ),
+            pytest.param(
+                "What is RAG?",
+                "RAG is Retrieval-Augmented Generation.",
+                [],
+                id="general",
+            ),
+            pytest.param("", "Please provide a question.", [], id="empty"),
+        ],
+    )
+    def test_query_variants(self, rag_mocks, rag_factory, query, response, sources):
+        """Test the query flow from input to response and sources."""
+        rag_mocks.sm.get_conversation_history.return_value = None
+        rag = rag_factory(response=response, sources=sources)
+
+        answer, returned_sources = rag.query(query, session_id="test_session")
+
+        assert answer == response
+        assert returned_sources == sources
 
         # Verify AI generator was called with tools
-        mock_ai_instance.generate_response.assert_called_once()
-        call_args = mock_ai_instance.generate_response.call_args
-        assert "tools" in call_args[1]
-        assert "tool_manager" in call_args[1]
+        rag_mocks.ai.generate_response.assert_called_once()
+        kwargs = rag_mocks.ai.generate_response.call_args.kwargs
+        assert {"tools", "tool_manager"} <= kwargs.keys()
 
         # Verify session was updated
-        mock_sm_instance.add_exchange.assert_called_once()
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_outline_query_flow(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test outline query flow."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
-
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(
-            return_value="Course outline: Lesson 0, Lesson 1, Lesson 5"
-        )
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_sm_instance = Mock()
-        mock_sm_instance.get_conversation_history = Mock(return_value=None)
-        mock_session_mgr.return_value = mock_sm_instance
-
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
-
-        rag = RAGSystem(mock_config)
-        rag.tool_manager.get_last_sources = Mock(
-            return_value=[{"text": "MCP Course", "link": "https://example.com/course"}]
+        rag_mocks.sm.add_exchange.assert_called_once_with(
+            "test_session", query, response
         )
 
-        response, sources = rag.query("What is the outline of MCP course?")
-
-        assert "Course outline" in response
-        assert len(sources) > 0
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_general_query_without_tools(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test general knowledge query that doesn't need tools."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
-
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(
-            return_value="RAG is Retrieval-Augmented Generation."
-        )
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_sm_instance = Mock()
-        mock_sm_instance.get_conversation_history = Mock(return_value=None)
-        mock_session_mgr.return_value = mock_sm_instance
-
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
-
-        rag = RAGSystem(mock_config)
-        rag.tool_manager.get_last_sources = Mock(return_value=[])
-
-        response, sources = rag.query("What is RAG?")
-
-        assert "Retrieval-Augmented Generation" in response
-        assert len(sources) == 0
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_session_management(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+    def test_session_management(self, rag_mocks, rag_factory):
         """Test that session history is properly managed."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
-
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(return_value="Response")
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_sm_instance = Mock()
         history = "User: Previous question\nAssistant: Previous answer"
-        mock_sm_instance.get_conversation_history = Mock(return_value=history)
-        mock_sm_instance.add_exchange = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
-
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
-
-        rag = RAGSystem(mock_config)
-        rag.tool_manager.get_last_sources = Mock(return_value=[])
+        rag_mocks.sm.get_conversation_history.return_value = history
+        rag = rag_factory(response="Response", sources=[])
 
         rag.query("Follow-up question", session_id="test_session")
 
         # Verify history was retrieved
-        mock_sm_instance.get_conversation_history.assert_called_once_with(
-            "test_session"
-        )
+        rag_mocks.sm.get_conversation_history.assert_called_once_with("test_session")
 
         # Verify history was passed to AI
-        call_args = mock_ai_instance.generate_response.call_args
-        assert call_args[1]["conversation_history"] == history
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_source_reset_after_retrieval(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test that sources are reset after being retrieved."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
-
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(return_value="Response")
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_sm_instance = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
+        kwargs = rag_mocks.ai.generate_response.call_args.kwargs
+        assert kwargs.get("conversation_history") == history
 
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
-
-        rag = RAGSystem(mock_config)
-        rag.tool_manager.get_last_sources = Mock(return_value=[{"text": "source"}])
-        rag.tool_manager.reset_sources = Mock()
+    def test_source_reset_after_retrieval(self, rag_factory):
+        """Test that sources are reset after being retrieved."""
+        rag = rag_factory(response="Response", sources=[{"text": "source"}])
 
         rag.query("Test query")
 
         # Verify sources were reset
         rag.tool_manager.reset_sources.assert_called_once()
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_error_handling_in_query(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+    def test_error_handling_in_query(self, rag_mocks, rag_factory):
         """Test error handling when query fails."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
+        rag_mocks.ai.generate_response.side_effect = Exception("API Error")
+        rag = rag_factory()
 
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(side_effect=Exception("API Error"))
-        mock_ai_gen.return_value = mock_ai_instance
+        with pytest.raises(Exception, match="API Error"):
+            rag.query("Test query")
 
-        mock_sm_instance = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
+    def test_tools_registered_on_initialization(self, rag_factory):
+        """Test that both search and outline tools are registered."""
+        rag = rag_factory()
 
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
+        # Verify both tools are registered
+        tool_definitions = rag.tool_manager.get_tool_definitions()
+        tool_names = [t["name"] for t in tool_definitions]
 
-        rag = RAGSystem(mock_config)
+        assert "search_course_content" in tool_names
+        assert "get_course_outline" in tool_names
 
-        with pytest.raises(Exception) as exc_info:
-            rag.query("Test query")
+    async def test_aquery_keeps_sources_per_request(self, rag_mocks, rag_factory):
+        """Test that concurrent async queries don't see each other's sources."""
+        rag_mocks.sm.get_conversation_history.return_value = None
+        rag = rag_factory()
 
-        assert "API Error" in str(exc_info.value)
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_tools_registered_on_initialization(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test that both search and outline tools are registered."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
+        async def fake_generate(query, **kwargs):
+            # Record a source, then yield so the other query runs in between
+            rag.search_tool._record_sources([{"text": query, "link": None}])
+            await asyncio.sleep(0)
+            return f"Answer to {query}"
 
-        mock_ai_instance = Mock()
-        mock_ai_gen.return_value = mock_ai_instance
+        rag_mocks.ai.agenerate_response.side_effect = fake_generate
 
-        mock_sm_instance = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
+        (answer_a, sources_a), (answer_b, sources_b) = await asyncio.gather(
+            rag.aquery("first"), rag.aquery("second")
+        )
 
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
+        assert answer_a.endswith("first")
+        assert sources_a[0]["text"].endswith("first")
+        assert answer_b.endswith("second")
+        assert sources_b[0]["text"].endswith("second")
+
+    async def test_astream_query_drops_tool_lead_in(self, rag_mocks, rag_factory):
+        """Test that lead-in text retracted by the generator is not saved."""
+        rag_mocks.sm.get_conversation_history.return_value = None
+        rag = rag_factory(sources=[])
+
+        async def fake_stream(query, **kwargs):
+            for chunk in ("Let me search. ", STREAM_RESET, "Lesson 5 covers MCP."):
+                yield chunk
+
+        rag_mocks.ai.stream_response.side_effect = fake_stream
+
+        events = [
+            event async for event in rag.astream_query("What is in lesson 5?", "s1")
+        ]
+
+        assert events == [
+            {"type": "text", "text": "Let me search. "},
+            {"type": "reset"},
+            {"type": "text", "text": "Lesson 5 covers MCP."},
+            {"type": "done", "sources": []},
+        ]
+        rag_mocks.sm.add_exchange.assert_called_once_with(
+            "s1", "What is in lesson 5?", "Lesson 5 covers MCP."
+        )
 
-        rag = RAGSystem(mock_config)
+    async def test_concurrent_queries(self, rag_mocks, rag_factory):
+        """Test that many async queries can be in flight at once."""
+        rag = rag_factory()
+        in_flight = peak = 0
 
-        # Verify both tools are registered
-        tool_definitions = rag.tool_manager.get_tool_definitions()
-        tool_names = [t["name"] for t in tool_definitions]
+        async def fake_generate(query, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "ok"
 
-        assert "search_course_content" in tool_names
-        assert "get_course_outline" in tool_names
+        rag_mocks.ai.agenerate_response.side_effect = fake_generate
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.SessionManager")
-    @patch("rag_system.DocumentProcessor")
-    def test_empty_query_handling(
-        self,
-        mock_doc_proc,
-        mock_session_mgr,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
+        results = await asyncio.gather(*[rag.aquery(f"q{i}") for i in range(50)])
+
+        assert [answer for answer, _ in results] == ["ok"] * 50
+        # The model calls overlapped instead of running one after another
+        assert peak == 50
+
+    async def test_aquery_batch_preserves_order_and_limits_concurrency(
+        self, rag_mocks, rag_factory
     ):
-        """Test handling of empty queries."""
-        mock_vs_instance = Mock()
-        mock_vector_store.return_value = mock_vs_instance
+        """Test that batch answers keep query order with bounded concurrency."""
+        rag = rag_factory()
+        limit = rag.config.MAX_CONCURRENT_QUERIES
+        in_flight = peak = 0
 
-        mock_ai_instance = Mock()
-        mock_ai_instance.generate_response = Mock(
-            return_value="Please provide a question."
-        )
-        mock_ai_gen.return_value = mock_ai_instance
+        async def fake_generate(query, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return kwargs["question"]
+
+        rag_mocks.ai.agenerate_response.side_effect = fake_generate
+
+        queries = [f"q{i}" for i in range(limit + 5)]
+        results = await rag.aquery_batch(queries)
+
+        assert [answer for answer, _ in results] == queries
+        assert peak == limit
 
-        mock_sm_instance = Mock()
-        mock_session_mgr.return_value = mock_sm_instance
+    async def test_aquery_batch_returns_errors_per_query(self, rag_mocks, rag_factory):
+        """Test that a failed query is returned in place, not raised."""
+        rag = rag_factory(sources=[])
+        error = RuntimeError("Overloaded")
 
-        mock_dp_instance = Mock()
-        mock_doc_proc.return_value = mock_dp_instance
+        async def fake_generate(query, **kwargs):
+            if kwargs["question"] == "bad":
+                raise error
+            return "ok"
 
-        rag = RAGSystem(mock_config)
-        rag.tool_manager.get_last_sources = Mock(return_value=[])
+        rag_mocks.ai.agenerate_response.side_effect = fake_generate
 
-        response, sources = rag.query("")
+        results = await rag.aquery_batch(["good", "bad", "good"])
 
-        assert isinstance(response, str)
-        assert len(sources) == 0
+        assert results == [("ok", []), error, ("ok", [])]
@@ -2,18 +2,22 @@
 Tests for search_tools.py - CourseSearchTool and CourseOutlineTool.
 """
 
-import sys
-from pathlib import Path
-from unittest.mock import Mock
+import time
+from contextlib import nullcontext
+from unittest.mock import Mock, call
 
 import pytest
+from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
+from vector_store import SearchResults
 
-# Add backend to path
-backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
-
-from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager  # noqa: E402
-from vector_store import SearchResults  # noqa: E402
+# Fragments every formatted outline of the sample course must contain
+_OUTLINE_REQUIRED = (
+    "Course: MCP: Build Rich-Context AI Apps",
+    "Course Link:",
+    "Instructor:",
+    "Lessons",
+    "Lesson 0: Introduction",
+)
 
 
 class TestCourseSearchTool:
@@ -28,9 +32,11 @@ class TestCourseSearchTool:
         )
 
         # Verify search was called
-        mock_vector_store.search.assert_called_once_with(
-            query="What is covered in lesson 5", course_name="MCP", lesson_number=5
-        )
+        assert mock_vector_store.calls == [
+            call.search(
+                query="What is covered in lesson 5", course_name="MCP", lesson_number=5
+            )
+        ]
 
         # Verify result format
         assert isinstance(result, str)
@@ -45,9 +51,9 @@ class TestCourseSearchTool:
 
         result = tool.execute(query="What is MCP")
 
-        mock_vector_store.search.assert_called_once_with(
-            query="What is MCP", course_name=None, lesson_number=None
-        )
+        assert mock_vector_store.calls == [
+            call.search(query="What is MCP", course_name=None, lesson_number=None)
+        ]
 
         assert isinstance(result, str)
         assert len(result) > 0
@@ -66,9 +72,9 @@ class TestCourseSearchTool:
 
         result = tool.execute(query="MCP concepts", course_name="MCP")
 
-        mock_vector_store.search.assert_called_once_with(
-            query="MCP concepts", course_name="MCP", lesson_number=None
-        )
+        assert mock_vector_store.calls == [
+            call.search(query="MCP concepts", course_name="MCP", lesson_number=None)
+        ]
 
         assert isinstance(result, str)
 
@@ -107,6 +113,8 @@ class TestCourseSearchTool:
         assert "course_name" in definition["input_schema"]["properties"]
         assert "lesson_number" in definition["input_schema"]["properties"]
         assert definition["input_schema"]["required"] == ["query"]
+        # Built once and shared by every instance
+        assert CourseSearchTool(mock_vector_store).get_tool_definition() is definition
 
 
 class TestCourseOutlineTool:
@@ -119,15 +127,12 @@ class TestCourseOutlineTool:
         result = tool.execute(course_name="MCP")
 
         # Verify outline was requested
-        mock_vector_store.get_course_outline.assert_called_once_with("MCP")
+        assert mock_vector_store.calls == [call.get_course_outline("MCP")]
 
         # Verify result format
         assert isinstance(result, str)
-        assert "Course: MCP: Build Rich-Context AI Apps" in result
-        assert "Course Link:" in result
-        assert "Instructor:" in result
-        assert "Lessons" in result
-        assert "Lesson 0: Introduction" in result
+        missing = [s for s in _OUTLINE_REQUIRED if s not in result]
+        assert not missing, f"missing fragments: {missing}"
 
     def test_outline_for_nonexistent_course(self, mock_vector_store):
         """Test outline request for nonexistent course."""
@@ -159,6 +164,7 @@ class TestCourseOutlineTool:
         assert "input_schema" in definition
         assert "course_name" in definition["input_schema"]["properties"]
         assert definition["input_schema"]["required"] == ["course_name"]
+        assert tool.get_tool_definition() is definition
 
 
 class TestToolManager:
@@ -179,6 +185,22 @@ class TestToolManager:
         assert any(d["name"] == "search_course_content" for d in definitions)
         assert any(d["name"] == "get_course_outline" for d in definitions)
 
+        # Tools are looked up by name
+        assert len(manager.tools) == 2
+        assert manager.tools["search_course_content"] is search_tool
+        assert manager.tools["get_course_outline"] is outline_tool
+
+    def test_definitions_built_once_until_new_tool(self, mock_vector_store):
+        """Test that definitions are reused until another tool is registered."""
+        manager = ToolManager()
+        manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        first = manager.get_tool_definitions()
+        assert manager.get_tool_definitions() is first
+
+        manager.register_tool(CourseOutlineTool(mock_vector_store))
+        assert len(manager.get_tool_definitions()) == 2
+
     def test_execute_search_tool(self, mock_vector_store):
         """Test executing search tool through manager."""
         manager = ToolManager()
@@ -209,6 +231,52 @@ class TestToolManager:
 
         assert "Tool 'nonexistent_tool' not found" in result
 
+    async def test_aexecute_tool_runs_sync_tool(self, mock_vector_store):
+        """Test executing a blocking tool through the async entry point."""
+        manager = ToolManager()
+        manager.register_tool(CourseOutlineTool(mock_vector_store))
+
+        result = await manager.aexecute_tool("get_course_outline", course_name="MCP")
+        missing = await manager.aexecute_tool("nonexistent_tool", query="test")
+
+        assert "Course:" in result
+        assert "Tool 'nonexistent_tool' not found" in missing
+
+    @pytest.mark.parametrize("scoped", [True, False], ids=["scope", "no-scope"])
+    async def test_round_keeps_sources_of_every_call_in_order(self, scoped):
+        """Test that same-tool calls in one round all contribute their sources."""
+
+        def search(query, course_name=None, lesson_number=None):
+            # The first call finishes last
+            time.sleep(0.05 if course_name == "Course A" else 0)
+            return SearchResults(
+                documents=[f"{course_name} content"],
+                metadata=[{"course_title": course_name}],
+                distances=[0.1],
+            )
+
+        store = Mock(spec_set=["search", "get_lesson_link"])
+        store.search.side_effect = search
+        manager = ToolManager()
+        manager.register_tool(CourseSearchTool(store))
+        calls = [
+            ("search_course_content", {"query": "intro", "course_name": course})
+            for course in ("Course A", "Course B")
+        ]
+
+        with manager.source_scope() if scoped else nullcontext():
+            results = await manager.aexecute_tools(calls)
+            sources = manager.get_last_sources()
+
+        assert results == [
+            "[Course A]\nCourse A content",
+            "[Course B]\nCourse B content",
+        ]
+        assert sources == [
+            {"text": "Course A", "link": None},
+            {"text": "Course B", "link": None},
+        ]
+
     def test_get_last_sources(self, mock_vector_store):
         """Test retrieving sources from last tool execution."""
         manager = ToolManager()
@@ -231,3 +299,13 @@ class TestToolManager:
 
         sources = manager.get_last_sources()
         assert len(sources) == 0
+
+    @pytest.mark.benchmark(group="tool-dispatch")
+    def test_execute_tool_dispatch_perf(self, mock_vector_store, benchmark):
+        """Benchmark tool dispatch; time it with `pytest -n0 --benchmark-only`."""
+        manager = ToolManager()
+        manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        result = benchmark(manager.execute_tool, "search_course_content", query="q")
+
+        assert result.startswith("[MCP Course - Lesson 5]")
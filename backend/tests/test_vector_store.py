@@ -0,0 +1,63 @@
+"""
+Tests for vector_store.py - Search result caching.
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+from vector_store import VectorStore
+
+CHROMA_RESULTS = {
+    "documents": [["This is content from lesson 5 about MCP client."]],
+    "metadatas": [[{"course_title": "MCP Course", "lesson_number": 5}]],
+    "distances": [[0.1]],
+}
+
+
+@pytest.fixture
+def store():
+    """VectorStore over mock collections, so no database or model is loaded."""
+    with (
+        patch("vector_store.chromadb.PersistentClient"),
+        patch(
+            "vector_store.chromadb.utils.embedding_functions."
+            "SentenceTransformerEmbeddingFunction"
+        ),
+    ):
+        store = VectorStore("./test_chroma_db", "test-model")
+
+    store.course_content = Mock(spec_set=["query", "add"])
+    store.course_content.query.return_value = CHROMA_RESULTS
+    return store
+
+
+class TestVectorStoreSearchCache:
+    """Tests for the cache in front of VectorStore.search()."""
+
+    def test_repeated_search_served_from_cache(self, store):
+        """Test that an identical search skips the collection query."""
+        first = store.search("MCP client", lesson_number=5)
+        second = store.search("MCP client", lesson_number=5)
+
+        assert second is first
+        assert first.documents == CHROMA_RESULTS["documents"][0]
+        store.course_content.query.assert_called_once_with(
+            query_texts=["MCP client"],
+            n_results=store.max_results,
+            where={"lesson_number": 5},
+        )
+
+    def test_different_filters_miss_cache(self, store):
+        """Test that the filters are part of the cache key."""
+        store.search("MCP client", lesson_number=5)
+        store.search("MCP client", lesson_number=6)
+
+        assert store.course_content.query.call_count == 2
+
+    def test_adding_content_clears_cache(self, store, sample_chunks):
+        """Test that new content makes the next search hit the collection."""
+        store.search("MCP client")
+        store.add_course_content(sample_chunks)
+        store.search("MCP client")
+
+        assert store.course_content.query.call_count == 2
@@ -2,14 +2,15 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
 import chromadb
+from cache import TTLCache
 from chromadb.config import Settings
 from models import Course, CourseChunk
 from sentence_transformers import SentenceTransformer
 
 
-@dataclass
+@dataclass(frozen=True)
 class SearchResults:
-    """Container for search results with metadata"""
+    """Container for search results with metadata (shared via the search cache)"""
 
     documents: List[str]
     metadata: List[Dict[str, Any]]
@@ -44,8 +45,17 @@ class SearchResults:
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
 
-    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
+    def __init__(
+        self,
+        chroma_path: str,
+        embedding_model: str,
+        max_results: int = 5,
+        cache_size: int = 1024,
+        cache_ttl: float = 600.0,
+    ):
         self.max_results = max_results
+        # Recent search results, so a repeated search is free
+        self._search_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=chroma_path, settings=Settings(anonymized_telemetry=False)
@@ -105,11 +115,18 @@ class VectorStore:
         # Use provided limit or fall back to configured max_results
         search_limit = limit if limit is not None else self.max_results
 
+        cache_key = (query, course_title, lesson_number, search_limit)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             results = self.course_content.query(
                 query_texts=[query], n_results=search_limit, where=filter_dict
             )
-            return SearchResults.from_chroma(results)
+            search_results = SearchResults.from_chroma(results)
+            self._search_cache.set(cache_key, search_results)
+            return search_results
         except Exception as e:
             return SearchResults.empty(f"Search error: {str(e)}")
 
@@ -152,6 +169,7 @@ class VectorStore:
         import json
 
         course_text = course.title
+        self._search_cache.clear()
 
         # Build lessons metadata and serialize as JSON string
         lessons_metadata = []
@@ -185,6 +203,7 @@ class VectorStore:
         if not chunks:
             return
 
+        self._search_cache.clear()
         documents = [chunk.content for chunk in chunks]
         metadatas = [
             {
@@ -204,6 +223,7 @@ class VectorStore:
 
     def clear_all_data(self):
         """Clear all data from both collections"""
+        self._search_cache.clear()
         try:
             self.client.delete_collection("course_catalog")
             self.client.delete_collection("course_content")
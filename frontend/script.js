@@ -76,7 +76,7 @@ async function sendMessage() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 
     try {
-        const response = await fetch(`${API_URL}/query`, {
+        const response = await fetch(`${API_URL}/query/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -87,21 +87,54 @@ async function sendMessage() {
             })
         });
 
-        if (!response.ok) throw new Error('Query failed');
-
-        const data = await response.json();
-        console.log('API Response:', data);
-        console.log('Sources:', data.sources);
-
-        // Update session ID if new
-        if (!currentSessionId) {
-            currentSessionId = data.session_id;
+        if (!response.ok || !response.body) throw new Error('Query failed');
+
+        // Read newline-delimited JSON events as the answer is generated
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const loadingContent = loadingMessage.querySelector('.message-content');
+        const loadingHtml = loadingContent.innerHTML;
+        let buffer = '';
+        let answer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+
+                if (event.type === 'text') {
+                    // Render partial answer in place of the loading indicator
+                    answer += event.text;
+                    loadingContent.innerHTML = marked.parse(answer);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event.type === 'reset') {
+                    // Text so far only led into tool calls - show loading again
+                    answer = '';
+                    loadingContent.innerHTML = loadingHtml;
+                } else if (event.type === 'done') {
+                    console.log('Sources:', event.sources);
+
+                    // Update session ID if new
+                    if (!currentSessionId) {
+                        currentSessionId = event.session_id;
+                    }
+
+                    // Replace streamed message with final response and sources
+                    loadingMessage.remove();
+                    addMessage(answer, 'assistant', event.sources);
+                } else if (event.type === 'error') {
+                    throw new Error(event.detail || 'Query failed');
+                }
+            }
         }
 
-        // Replace loading message with response
-        loadingMessage.remove();
-        addMessage(data.answer, 'assistant', data.sources);
-
     } catch (error) {
         // Replace loading message with error
         loadingMessage.remove();